@@ -0,0 +1,536 @@
+# -*- coding: utf-8 -*-
+"""
+スクレイパーのオフラインベンチマーク
+- bench_fixtures/ の一覧・詳細ページをローカルHTTPサーバで配信し、
+  scraper.py の MAPS_BASE_URL をそこへ向けて実行する（Googleには一切アクセスしない）
+- シナリオ（single / parallel / lean / lean-parallel / tabs）ごとに
+  件数/秒・フェーズ別レイテンシ・ピークRSS・抽出結果の正しさを計測
+- preflight シナリオは公式サイトの事前確認（SitePreflight）だけを、同じサーバの /site/ 以下で計測する（Chrome不要）
+- 結果はJSONレポートで出力（--out）。実行ごとに比較できるよう git コミットも記録する
+
+例: python3 scripts/bench_scraper.py --places 40 --scenarios single,parallel,lean --workers 3 --out bench.json
+
+実際に保存したページで計測したい場合は --fixtures に同じ構成のディレクトリを渡し、
+places/<プレイスID>.html を置くとテンプレートの代わりにそちらを返す。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import threading
+import subprocess
+from contextlib import suppress
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, quote
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import scraper  # noqa: E402
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures")
+SCENARIOS = {
+    "single": {"workers": 1, "lean": False, "tabs": 1},
+    "parallel": {"workers": None, "lean": False, "tabs": 1},
+    "lean": {"workers": 1, "lean": True, "tabs": 1},
+    "lean-parallel": {"workers": None, "lean": True, "tabs": 1},
+    "tabs": {"workers": 1, "lean": False, "tabs": None},
+    "dom": {"workers": 1, "lean": False, "tabs": 1, "embedded": False},
+    "cdp": {"workers": 1, "lean": False, "tabs": None, "backend": "cdp"},
+    "preflight": {"preflight": True},
+    "resolve": {"resolve": True},
+}
+SITE_KINDS = ("ok", "ok", "ok", "dead", "redirect", "not_html")  # /site/ 以下の応答パターン（プレイス番号で循環）
+DUMMY_ASSET = b"\x89PNG\r\n\x1a\n" + b"\0" * 20000  # 地図タイル・画像の代わり（leanの効果測定用）
+
+def log(msg):
+    print(msg, file=sys.stderr, flush=True)
+
+# ===== フィクスチャ =====
+def make_places(n):
+    """決定的な合成プレイスを n 件作る（期待値との照合にも使う）"""
+    places = []
+    for i in range(n):
+        name = f"ベンチ工務店{i:03d}"
+        lat, lng = round(34.68 + i * 0.001, 6), round(135.80 + i * 0.001, 6)
+        fid = f"0x6001{i:04x}:0x{(i + 1) * 7919:x}"
+        places.append({
+            "name": name,
+            "slug": f"bench{i:03d}",
+            "fid": fid,
+            "lat": lat,
+            "lng": lng,
+            "path": f"/maps/place/{quote(name)}/@{lat},{lng},17z/data=!4m6!3m5!1s{fid}!8m2!3d{lat}!4d{lng}",
+            "rating": f"{3 + (i % 20) / 10:.1f}",
+            "reviews": (i * 13) % 400 + 1,
+            "category": "工務店",
+            "postal": f"630-{8000 + i:04d}",
+            "street": f"法華寺町{i + 1}-{i % 9 + 1}",
+            "address": f"奈良県奈良市法華寺町{i + 1}-{i % 9 + 1}",
+            "phone": f"0742-{10 + i % 90:02d}-{1000 + i:04d}",
+            "website": f"https://bench{i:03d}.example.jp/",
+        })
+    return places
+
+def embedded_state(p):
+    """place.html に埋め込む APP_INITIALIZATION_STATE（scraper.parse_embedded_place が読む位置だけ埋める）"""
+    info = [None] * 180
+    info[4] = [None] * 7 + [float(p["rating"]), p["reviews"]]
+    info[7] = [p["website"]]
+    info[9] = [None, None, p["lat"], p["lng"]]
+    info[10] = p["fid"]
+    info[11] = p["name"]
+    info[13] = [p["category"]]
+    info[39] = f"日本、〒{p['postal']} {p['address']}"
+    info[178] = [[p["phone"]]]
+    payload = ")]}'\n" + json.dumps([None] * 6 + [info], ensure_ascii=False)
+    state = [None, None, None, [None] * 6 + [payload]]
+    return json.dumps(state, ensure_ascii=False).replace("</", "<\\/")
+
+def render(template, values):
+    for k, v in values.items():
+        template = template.replace("{{" + k + "}}", str(v))
+    return template
+
+class FixtureServer:
+    """一覧・詳細ページを返すローカルHTTPサーバ（別スレッドで起動）"""
+
+    def __init__(self, fixture_dir, places, batch=10, feed_delay_ms=300, latency_ms=0, site_latency_ms=0):
+        self.fixture_dir = fixture_dir
+        self.places = places
+        self.by_fid = {p["fid"]: p for p in places}
+        self.by_slug = {p["slug"]: i for i, p in enumerate(places)}
+        self.site_latency_ms = site_latency_ms
+        self.batch = batch
+        self.feed_delay_ms = feed_delay_ms
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler(), bind_and_activate=False)
+        self.httpd.request_queue_size = 128  # preflight の同時接続でSYNが溢れないように
+        self.httpd.server_bind()
+        self.httpd.server_activate()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _read(self, name):
+        with open(os.path.join(self.fixture_dir, name), encoding="utf-8") as f:
+            return f.read()
+
+    def page_for(self, path, query):
+        """(content_type, body) を返す（該当なしは None）"""
+        if path.startswith("/maps/vt") or path.startswith("/maps/api/staticmap") or path.endswith(".png"):
+            return "image/png", DUMMY_ASSET
+        if path.startswith("/maps/search"):
+            q = parse_qs(query).get("query", [""])[0]
+            html = render(self._read("search.html"), {
+                "query": q, "total": len(self.places), "batch": self.batch,
+                "feed_delay_ms": self.feed_delay_ms,
+                "places_json": json.dumps(self.places, ensure_ascii=False),
+            })
+            return "text/html; charset=utf-8", html.encode("utf-8")
+        if path.startswith("/maps/place/"):
+            fid = scraper.canonical_place_id(path)
+            captured = os.path.join(self.fixture_dir, "places", f"{fid.replace(':', '_')}.html")
+            if os.path.exists(captured):
+                with open(captured, "rb") as f:
+                    return "text/html; charset=utf-8", f.read()
+            p = self.by_fid.get(fid)
+            if not p: return None
+            return "text/html; charset=utf-8", render(self._read("place.html"), {**p, "state": embedded_state(p)}).encode("utf-8")
+        if path == "/maps" or path == "/maps/":
+            return "text/html; charset=utf-8", self._read("home.html").encode("utf-8")
+        return None
+
+    def site_for(self, path):
+        """公式サイトの代わり: (status, headers, body) を返す。/site/<slug>/ の応答は SITE_KINDS で決まる"""
+        parts = path.strip("/").split("/")
+        i = self.by_slug.get(parts[1]) if len(parts) > 1 else None
+        if i is None:
+            return 404, {}, b""
+        kind = SITE_KINDS[i % len(SITE_KINDS)]
+        if kind == "dead":
+            return 404, {}, b""
+        if kind == "redirect" and len(parts) == 2:
+            return 301, {"Location": f"/site/{parts[1]}/home"}, b""
+        if kind == "not_html":
+            return 200, {"Content-Type": "application/pdf"}, b"%PDF-1.4\n"
+        return 200, {"Content-Type": "text/html; charset=utf-8"}, f"<html><title>{parts[1]}</title></html>".encode("utf-8")
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                u = urlparse(self.path)
+                if u.path.startswith("/site/"):
+                    if server.site_latency_ms:
+                        time.sleep(server.site_latency_ms / 1000)
+                    status, headers, body = server.site_for(u.path)
+                    self.send_response(status)
+                    for k, v in headers.items():
+                        self.send_header(k, v)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                if server.latency_ms and u.path.startswith("/maps/place/"):
+                    time.sleep(server.latency_ms / 1000)
+                page = server.page_for(u.path, u.query)
+                if page is None:
+                    self.send_error(404)
+                    return
+                ctype, body = page
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Timing-Allow-Origin", "*")
+                self.end_headers()
+                self.wfile.write(body)
+                with server.lock:
+                    server.requests += 1
+                    server.bytes_sent += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+# ===== 計測 =====
+class RssSampler:
+    """
+    自プロセス＋子孫プロセス（chromedriver / Chrome）のRSS合計を一定間隔で取り、ピークを記録する。
+    psutil がなければ自プロセスの ru_maxrss のみ（Chrome分は含まれない）。
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def source(self):
+        return "process-tree" if psutil else "self-only"
+
+    def _sample(self):
+        if not psutil:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        total = 0
+        with suppress(Exception):
+            me = psutil.Process()
+            total = me.memory_info().rss
+            for child in me.children(recursive=True):
+                with suppress(Exception):
+                    total += child.memory_info().rss
+        return total
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.peak = max(self.peak, self._sample())
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak = max(self.peak, self._sample())
+        return round(self.peak / 1024 / 1024, 1)
+
+class CollectingWriter:
+    """ExtractPool / 逐次処理の出力先（stdoutには書かずにためる）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = []
+
+    @property
+    def count(self):
+        return len(self.rows)
+
+    def emit(self, row, seq=None):
+        with self.lock:
+            self.rows.append(row)
+
+    def checkpoint(self, **info):
+        pass
+
+def check_rows(rows, places):
+    """抽出結果を合成データの期待値と照合し、不一致件数を返す"""
+    expected = {p["name"]: p for p in places}
+    mismatches = 0
+    for row in rows:
+        p = expected.get(row.get("company_name"))
+        if (not p or row.get("phone") != p["phone"] or row.get("postal_code") != p["postal"]
+                or row.get("website_url") != p["website"] or row.get("review_count") != p["reviews"]):
+            mismatches += 1
+    return mismatches
+
+def run_scenario(name, base_url, places, workers, lean, headless, tabs=1, embedded=True, backend="selenium"):
+    scraper.MAPS_BASE_URL = base_url
+    scraper.BACKEND = backend
+    scraper.LEAN_MODE = lean
+    scraper.EMBEDDED_MODE = embedded
+    scraper.metrics = scraper.Metrics()
+    scraper.page_stats = scraper.PageStats()
+    scraper.scheduler = scraper.LoadScheduler()
+    scraper.health = scraper.BrowserHealth()
+
+    log(f"\n▶ シナリオ {name}: workers={workers}, lean={lean}, tabs={tabs}, embedded={embedded}, backend={backend}")
+    sampler = RssSampler().start()
+    t_start = time.monotonic()
+    driver = scraper.webdriver.Chrome(options=scraper.build_chrome_options(headless, lean))
+    if lean:
+        scraper.apply_lean_profile(driver)
+    writer = CollectingWriter()
+    pool = None
+    tab_pool = None
+    try:
+        if workers > 1:
+            drivers = scraper.launch_worker_drivers(workers, headless, lean)
+            pool = scraper.ExtractPool(drivers, "bench", writer, tabs=tabs)
+        elif tabs > 1:
+            tab_pool = scraper.open_tab_pool(driver, tabs)
+        startup_s = time.monotonic() - t_start
+
+        t_run = time.monotonic()
+        urls = scraper.search_and_collect(driver, "奈良市　工務店", max_pages=1, label=name)
+        if pool:
+            for u in urls:
+                pool.submit(u, "bench")
+            pool.finish_city("bench")
+            pool.join()
+        elif tab_pool:
+            pending = iter(list(urls))
+
+            def next_task(block):
+                u = next(pending, None)
+                return (u, None) if u else None
+
+            def on_done(u, ctx, row):
+                if row and row.get("company_name"):
+                    writer.emit(scraper.tag_row(row, "bench", "bench"))
+
+            scraper.run_tab_pipeline(tab_pool, next_task, on_done)
+        else:
+            for u in urls:
+                row = scraper.extract_place(driver, u)
+                if row and row.get("company_name"):
+                    writer.emit(scraper.tag_row(row, "bench", "bench"))
+        run_s = time.monotonic() - t_run
+    finally:
+        if pool:
+            pool.close()
+        with suppress(Exception):
+            driver.quit()
+    peak_rss_mb = sampler.stop()
+
+    summ = scraper.metrics.summary(writer.count)
+    ps = scraper.page_stats
+    return {
+        "name": name,
+        "workers": workers,
+        "lean": lean,
+        "tabs": tabs,
+        "embedded": embedded,
+        "urls": len(urls),
+        "places": writer.count,
+        "mismatches": check_rows(writer.rows, places),
+        "startup_s": round(startup_s, 2),
+        "run_s": round(run_s, 2),
+        "places_per_sec": round(writer.count / run_s, 3) if run_s > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb,
+        "rss_source": sampler.source,
+        "page_avg_kb": round(ps.bytes / ps.count / 1024, 1) if ps.count else None,
+        "page_avg_ready_ms": round(ps.ready_ms / ps.count, 1) if ps.count else None,
+        "timeouts": summ["timeouts"],
+        "retried": scraper.scheduler.retried,
+        "recovered": scraper.scheduler.recovered,
+        "phases": summ["phases"],
+    }
+
+def run_preflight(base_url, places, concurrency, per_host):
+    """サイト事前確認だけを計測し、site_ok / site_status が SITE_KINDS どおりかを照合する"""
+    log(f"\n▶ シナリオ preflight: concurrency={concurrency}, per_host={per_host}, aiohttp={scraper.aiohttp is not None}")
+    pre = scraper.SitePreflight(concurrency, per_host, timeout=5)
+    rows = []
+    t_run = time.monotonic()
+    for p in places:
+        pre.submit({"company_name": p["name"], "website_url": f"{base_url}/site/{p['slug']}/"}, rows.append)
+    pre.drain()
+    run_s = time.monotonic() - t_run
+    pre.close()
+
+    index = {p["name"]: i for i, p in enumerate(places)}
+    mismatches = 0
+    for r in rows:
+        kind = SITE_KINDS[index[r["company_name"]] % len(SITE_KINDS)]
+        if r["site_ok"] != (kind in ("ok", "redirect")) or (kind == "dead") != (r["site_status"] == 404):
+            mismatches += 1
+    ms = sorted(r["site_ms"] for r in rows)
+    return {
+        "name": "preflight",
+        "backend": "aiohttp" if scraper.aiohttp else "urllib",
+        "concurrency": concurrency,
+        "per_host": per_host,
+        "urls": len(places),
+        "places": len(rows),
+        "mismatches": mismatches + len(places) - len(rows),
+        "run_s": round(run_s, 2),
+        "places_per_sec": round(len(rows) / run_s, 3) if run_s > 0 else 0.0,
+        "p50_ms": ms[len(ms) // 2] if ms else None,
+        "max_ms": ms[-1] if ms else None,
+        "verdicts": dict(pre.stats),
+        "peak_rss_mb": None,
+    }
+
+def run_resolve_check(places):
+    """
+    名寄せだけを計測し、クラスタ数が想定どおりかを照合する。
+    - 電話番号の無い同名行を挟んだ別電話番号の支店（3行）は2クラスタのまま
+    - 137m 間隔で並ぶ同名チェーン（1店おきに電話番号なし）は隣の1店とだけまとまり、連鎖しない
+    """
+    log(f"\n▶ シナリオ resolve: chain={places}")
+    cases = [
+        ("bridge", [
+            {"company_name": "ABCラーメン 奈良店", "phone": "0742-11-1111", "latitude": 34.6851, "longitude": 135.8048},
+            {"company_name": "ABCラーメン", "phone": "", "latitude": 34.6857, "longitude": 135.8052},
+            {"company_name": "ABCラーメン 西大寺店", "phone": "0742-22-2222", "latitude": 34.6862, "longitude": 135.8057},
+        ], 2),
+        ("chain", [
+            {"company_name": "ABCラーメン", "phone": f"0742-{30 + i // 10000:02d}-{i % 10000:04d}" if i % 2 == 0 else "",
+             "latitude": 34.6851 + i * 0.00123, "longitude": 135.8048}
+            for i in range(places)
+        ], places // 2),
+    ]
+    mismatches = 0
+    checks = {}
+    t_run = time.monotonic()
+    for name, rows, expected in cases:
+        merged = scraper.resolve_entities(rows)
+        phones = {r["phone"] for r in rows if r["phone"]}
+        kept = {r["phone"] for r in merged if r.get("phone")}
+        ok = len(merged) == expected and phones == kept
+        mismatches += 0 if ok else 1
+        checks[name] = {"rows": len(rows), "clusters": len(merged), "expected": expected, "ok": ok}
+        log(f"   {'✔' if ok else '✖'} {name}: {len(rows)}行 → {len(merged)}クラスタ（想定 {expected}）")
+    run_s = time.monotonic() - t_run
+    return {
+        "name": "resolve",
+        "places": sum(c["rows"] for c in checks.values()),
+        "mismatches": mismatches,
+        "run_s": round(run_s, 2),
+        "places_per_sec": round(sum(c["rows"] for c in checks.values()) / run_s, 3) if run_s > 0 else 0.0,
+        "checks": checks,
+        "peak_rss_mb": None,
+    }
+
+def git_commit():
+    with suppress(Exception):
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True).strip()
+    return ""
+
+def main():
+    parser = argparse.ArgumentParser(description="スクレイパーのオフラインベンチマーク")
+    parser.add_argument("--places", type=int, default=30, help="一覧に並べるプレイス数")
+    parser.add_argument("--scenarios", default="single,parallel,lean", help=f"実行するシナリオ（{','.join(SCENARIOS)}）")
+    parser.add_argument("--workers", type=int, default=3, help="parallel系シナリオの詳細抽出Chrome数（scraper.py の --workers と同じ）")
+    parser.add_argument("--tabs", type=int, default=3, help="tabsシナリオの同時読み込みタブ数")
+    parser.add_argument("--latency-ms", type=int, default=0, help="詳細ページ応答に加える遅延（ms）")
+    parser.add_argument("--site-latency-ms", type=int, default=50, help="preflightシナリオのサイト応答に加える遅延（ms）")
+    parser.add_argument("--preflight-concurrency", type=int, default=scraper.PREFLIGHT_CONCURRENCY,
+                        help="preflightシナリオの同時接続数")
+    parser.add_argument("--feed-delay-ms", type=int, default=300, help="一覧の追加読み込みにかかる時間（ms）")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="フィクスチャのディレクトリ")
+    parser.add_argument("--no-headless", action="store_true", help="ブラウザを表示して実行")
+    parser.add_argument("--out", default="", help="JSONレポートの出力先（省略時はstdout）")
+    args = parser.parse_args()
+
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in names if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知のシナリオ: {', '.join(unknown)}")
+
+    if scraper.webdriver is None and any(not (SCENARIOS[n].get("preflight") or SCENARIOS[n].get("resolve")) for n in names):
+        print(json.dumps({"error": "selenium is not installed. Run: pip3 install selenium"}))
+        sys.exit(1)
+
+    places = make_places(args.places)
+    server = FixtureServer(args.fixtures, places, feed_delay_ms=args.feed_delay_ms, latency_ms=args.latency_ms,
+                           site_latency_ms=args.site_latency_ms).start()
+    log(f"🧪 フィクスチャサーバ: {server.base_url}（{len(places)}件）")
+
+    results = []
+    try:
+        for name in names:
+            conf = SCENARIOS[name]
+            if conf.get("resolve"):
+                results.append(run_resolve_check(200))
+                r = results[-1]
+                log(f"   → {r['places']}行 / {r['run_s']}秒 / 不一致 {r['mismatches']}件")
+                continue
+            if conf.get("preflight"):
+                # スタンドインは1ホストなので、ホストごとの上限も全体の同時接続数に合わせる
+                results.append(run_preflight(server.base_url, places, args.preflight_concurrency, args.preflight_concurrency))
+                r = results[-1]
+                log(f"   → {r['places']}件 / {r['run_s']}秒 / {r['places_per_sec']}件/秒 / 判定 {r['verdicts']} / 不一致 {r['mismatches']}件")
+                continue
+            workers = conf["workers"] or args.workers
+            tabs = conf["tabs"] or args.tabs
+            results.append(run_scenario(name, server.base_url, places, workers, conf["lean"], not args.no_headless, tabs,
+                                        conf.get("embedded", True), conf.get("backend", "selenium")))
+            r = results[-1]
+            log(f"   → {r['places']}件 / {r['run_s']}秒 / {r['places_per_sec']}件/秒 / "
+                f"RSS {r['peak_rss_mb']}MB / 不一致 {r['mismatches']}件")
+    finally:
+        server.stop()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "config": {
+            "places": args.places,
+            "workers": args.workers,
+            "tabs": args.tabs,
+            "latency_ms": args.latency_ms,
+            "feed_delay_ms": args.feed_delay_ms,
+            "site_latency_ms": args.site_latency_ms,
+            "fixtures": os.path.abspath(args.fixtures),
+        },
+        "server": {"requests": server.requests, "bytes_sent": server.bytes_sent},
+        "scenarios": results,
+    }
+    out = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(out + "\n")
+        log(f"📝 レポート: {args.out}")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
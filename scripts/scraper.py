@@ -7,12 +7,27 @@ Googleマップスクレイパー（営業DXプラットフォーム統合版）
 - 進捗はstderrに出力
 """
 
+import os
 import sys
+import ssl
+import math
 import time
 import json
 import re
+import queue
+import unicodedata
+import sqlite3
+import asyncio
 import argparse
-from urllib.parse import urlparse, parse_qs, quote_plus
+import difflib
+import threading
+import weakref
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from urllib.parse import urlparse, parse_qs, quote, quote_plus
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import suppress
 
 try:
@@ -26,16 +41,74 @@ try:
         NoSuchElementException, TimeoutException, StaleElementReferenceException
     )
 except ImportError:
-    print(json.dumps({"error": "selenium is not installed. Run: pip3 install selenium"}), file=sys.stdout)
-    sys.exit(1)
+    # スナップショット解析などの純Python部分はseleniumなしでも読み込めるようにし、
+    # 実際にブラウザを起動する main() でエラーを返す
+    webdriver = None
+
+try:
+    import psutil  # ブラウザのメモリ監視用（任意）
+except ImportError:
+    psutil = None
+
+try:
+    import websockets  # DevTools直結バックエンド（--backend cdp, 任意）
+except ImportError:
+    websockets = None
+
+try:
+    import aiohttp  # サイト事前確認の接続プール（任意。無ければ urllib をスレッドで使う）
+except ImportError:
+    aiohttp = None
 
 # ===== 設定 =====
 CARD_LOAD_TIMEOUT = 30
+MAPS_BASE_URL = "https://www.google.co.jp"  # ベンチマーク時はローカルのフィクスチャサーバに差し替える
+CHECKPOINT_INTERVAL = 30  # ndjson出力のcheckpoint間隔（秒）
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "scrape-cache.db")
+CACHE_TTL_DAYS = 14
+CACHE_MAX_ENTRIES = 200000
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "chrome-profile")
+BACKEND = "selenium"  # プレイス詳細の読み込み方式（main() で --backend cdp 指定時に "cdp"）
+PROFILE_DIR = None  # main() で --profile-dir 指定時に設定（Chromeごとに <PROFILE_DIR>/<slot> を使う）
+GRID_FULL_RESULTS = 100  # --grid: 1セルの一覧がこの件数以上なら取りこぼしありとみなして4分割
+GRID_MAX_DEPTH = 4
+AREA_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "jp_areas.json")  # 都道府県→市区町村（全国地方公共団体コードの一覧）
+# 政令指定都市（住所では "名古屋市中区" のように区が続くので、区までを市区町村として扱う）
+DESIGNATED_CITIES = frozenset((
+    "札幌市", "仙台市", "さいたま市", "千葉市", "横浜市", "川崎市", "相模原市", "新潟市", "静岡市", "浜松市",
+    "名古屋市", "京都市", "大阪市", "堺市", "神戸市", "岡山市", "広島市", "北九州市", "福岡市", "熊本市",
+))
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "sales-dx.db")
+SQLITE_BATCH_SIZE = 200  # --sqlite: 1トランザクションでまとめて書く件数
+GEOHASH_PRECISION = 7  # --resolve: 店名を比べる近接セルの細かさ（7桁 ≒ 150m四方、隣接セルまで比較）
+NAME_MATCH_RATIO = 0.85
+PREFLIGHT_CONCURRENCY = 32  # --preflight: 同時接続数（全体）
+PREFLIGHT_PER_HOST = 2
+PREFLIGHT_TIMEOUT = 10  # 秒（リダイレクト込み）
+PREFLIGHT_MAX_REDIRECTS = 5
+PREFLIGHT_MAX_BODY = 1 << 20  # 本文はこのバイト数まで読む（読み切れたら接続を再利用する）
+PREFLIGHT_UA = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+# ===== セレクタ =====
+NAME_SELECTORS = ['h1.DUwDvf.lfPIob', 'h1.fontHeadlineLarge', 'h1[aria-level="1"]', 'h1[role="heading"]', '[data-attrid="title"] span']
+CATEGORY_SELECTORS = ['button[jsaction*="category"]', 'button.DkEaL', 'a[jsaction*="category"]']
+WEBSITE_SELECTORS = ['a[data-item-id="authority"]', 'a[aria-label^="ウェブサイト:"]']
+ADDRESS_SELECTORS = ['button[aria-label^="住所:"]', '[data-item-id="address"]']
 
 # ===== 正規表現 =====
 POSTAL_RE = re.compile(r"〒?\s?(\d{3}[-−‐]\d{4})")
 TEL_RE = re.compile(r"0\d{1,4}[-−‐]?\d{1,4}[-−‐]?\d{3,4}")
 REVIEWS_RE = re.compile(r"(\d[\d,\.]*)\s*件のクチコミ")
+PLACE_FID_RE = re.compile(r"!1s(0x[0-9a-fA-F]+:0x[0-9a-fA-F]+)")
+PLACE_MID_RE = re.compile(r"!16s((?:%2F|/)[gm](?:%2F|/)[0-9A-Za-z_\-]+)")
+PLACE_URL_NOISE_RE = re.compile(r"/(@[^/]*|data=[^/]*)")
+HYPHEN_RE = re.compile(r"[−‐\-‒–—―ー−]")
+ADDRESS_HYPHEN_RE = re.compile(r"[−‐‒–—―−]|(?<=\d)[ーｰ](?=\d)")  # 住所では長音符は数字に挟まれたときだけ
+ADDRESS_PREFIX_RE = re.compile(r"^(日本[、,]?\s*)?(〒?\s*\d{3}-\d{4}\s*)?")
+WARD_RE = re.compile(r"^[^\s\d]{1,4}?区")  # 政令指定都市の区（"中区"〜"保土ケ谷区"）
+COMPANY_FORM_RE = re.compile(r"株式会社|有限会社|合同会社|合資会社|合名会社|一般社団法人|\(株\)|\(有\)|\(同\)|㈱|㈲")
+BRANCH_SUFFIX_RE = re.compile(r"\s+\S*(本店|支店|店|営業所|支社|事業所|ショールーム|オフィス)$")
+NAME_NOISE_RE = re.compile(r"[\s\-‐−・･.,、。'\"’”「」()（）\[\]【】/／&＆]+")
 
 COORD_URL_PATTERNS = [
     r"/@([\-0-9\.]+),([\-0-9\.]+),",
@@ -52,15 +125,119 @@ BLOCK_WEBSITE_NETLOCS = (
     "google.com", "google.co.jp", "maps.google.com", "maps.app.goo.gl",
     "goo.gl", "support.google.com"
 )
+# パスで店舗を分ける共有ホスト（名寄せでドメイン一致とみなさない）
+SHARED_SITE_HOSTS = BLOCK_WEBSITE_NETLOCS + (
+    "sites.google.com", "g.page", "linktr.ee", "lit.link",
+    "hotpepper.jp", "tabelog.com", "ekiten.jp", "suumo.jp", "homes.co.jp",
+)
+
+LOG_TAP = None  # 常駐モード（--serve）で実行中ジョブへ進捗を転送する関数
 
 def log(msg):
     """進捗をstderrに出力（Node.js側で読み取る）"""
     print(msg, file=sys.stderr, flush=True)
+    if LOG_TAP:
+        with suppress(Exception):
+            LOG_TAP(msg)
+
+# ===== 計測（フェーズ別イベント） =====
+def _percentile(sorted_vals, q):
+    if not sorted_vals: return 0.0
+    idx = min(len(sorted_vals) - 1, max(0, math.ceil(q * len(sorted_vals)) - 1))
+    return sorted_vals[idx]
+
+class Metrics:
+    """
+    フェーズ別の所要時間を記録する。
+    - configure() で出力先を指定すると1イベント1行のJSONを書き出す
+      ("stderr" ならstderr、それ以外はファイルパスに追記)
+    - 出力先がなくても集計は行い、summary() で p50/p95/max などを返す
+    phase: consent / search / scroll / url-collect / next-page / detail-open / extract
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.durations = defaultdict(list)
+        self.outcomes = defaultdict(lambda: defaultdict(int))
+        self.places = 0
+        self.sink = None
+
+    def configure(self, target):
+        if not target: return
+        self.sink = sys.stderr if target == "stderr" else open(target, "a", encoding="utf-8")
+
+    def _write(self, obj):
+        if not self.sink: return
+        with suppress(Exception):
+            self.sink.write(json.dumps(obj, ensure_ascii=False) + "\n")
+            self.sink.flush()
+
+    def event(self, phase, duration_s, url=None, outcome="ok", **extra):
+        ev = {"event": "phase", "phase": phase, "duration_ms": round(duration_s * 1000, 1),
+              "outcome": outcome, "t": round(time.monotonic() - self.started, 3)}
+        if url: ev["url"] = url
+        ev.update(extra)
+        with self.lock:
+            self.durations[phase].append(duration_s)
+            self.outcomes[phase][outcome] += 1
+            if phase == "extract" and outcome == "ok":
+                self.places += 1
+            self._write(ev)
+
+    @contextmanager
+    def phase(self, name, url=None, **extra):
+        """with metrics.phase("scroll") as ev: ...  ev["outcome"] / ev[任意キー] で結果を上書きできる"""
+        ev = {"outcome": "ok"}
+        t0 = time.monotonic()
+        try:
+            yield ev
+        except Exception:
+            ev["outcome"] = "error"
+            raise
+        finally:
+            outcome = ev.pop("outcome")
+            self.event(name, time.monotonic() - t0, url, outcome, **{**extra, **ev})  # ev の値で上書き
+
+    def summary(self, places=None):
+        with self.lock:
+            places = self.places if places is None else places
+            elapsed = time.monotonic() - self.started
+            phases = {}
+            for name, vals in self.durations.items():
+                vals = sorted(vals)
+                phases[name] = {
+                    "count": len(vals),
+                    "total_s": round(sum(vals), 2),
+                    "p50_ms": round(_percentile(vals, 0.50) * 1000, 1),
+                    "p95_ms": round(_percentile(vals, 0.95) * 1000, 1),
+                    "max_ms": round(vals[-1] * 1000, 1),
+                    "outcomes": dict(self.outcomes[name]),
+                }
+            return {
+                "event": "summary",
+                "elapsed_s": round(elapsed, 1),
+                "places": places,
+                "places_per_min": round(places / (elapsed / 60), 2) if elapsed > 0 else 0.0,
+                "timeouts": sum(o.get("timeout", 0) for o in self.outcomes.values()),
+                "phases": phases,
+            }
+
+    def report(self, places=None):
+        """集計をstderrのログと（出力先があれば）summaryイベントで出す（places省略時は抽出成功数）"""
+        summ = self.summary(places)
+        self._write(summ)
+        log(f"📊 計測: {summ['places']}件 / {summ['elapsed_s']}秒 / {summ['places_per_min']}件/分 / タイムアウト {summ['timeouts']}件")
+        for name, p in sorted(summ["phases"].items(), key=lambda x: -x[1]["total_s"]):
+            log(f"   {name:<12} n={p['count']:<5} 合計 {p['total_s']:.1f}s  p50 {p['p50_ms']:.0f}ms  p95 {p['p95_ms']:.0f}ms  max {p['max_ms']:.0f}ms")
+        return summ
+
+metrics = Metrics()
 
 # ===== ユーティリティ =====
 def normalize_hyphen(s):
     if not s: return s
-    return re.sub(r"[−‐\-‒–—―ー−]", "-", s)
+    return HYPHEN_RE.sub("-", s)
 
 def safe_text(el):
     try: return el.text.strip()
@@ -100,7 +277,39 @@ def is_block_website(href):
     return any(netloc.endswith(d) or netloc == d for d in BLOCK_WEBSITE_NETLOCS)
 
 # ===== Google同意画面処理 =====
+CONSENT_PAGE_JS = r"""
+if (location.hostname.startsWith('consent.')) return true;
+return !!document.querySelector('form[action*="consent.google"], iframe[src*="consent.google"]');
+"""
+# 同意画面が一度も出なかったdriver（以降は短い待ち時間で確認する）。id() だと終了したdriverの番号を
+# 新しいdriverが引き継ぐことがあるので、driver そのものを弱参照で持つ
+_NO_CONSENT_SEEN = weakref.WeakSet()
+
+def has_consent_cookie(driver):
+    """同意済みCookie（SOCS / CONSENT=YES+…）があるか"""
+    try:
+        cookies = driver.get_cookies()
+    except Exception:
+        return False
+    for c in cookies:
+        name, value = c.get("name"), str(c.get("value") or "")
+        if name == "SOCS" or (name == "CONSENT" and value.startswith("YES")):
+            return True
+    return False
+
+def consent_page_shown(driver):
+    try:
+        return bool(driver.execute_script(CONSENT_PAGE_JS))
+    except Exception:
+        return True  # 判定できなければ従来どおり探す
+
 def handle_google_consent(driver, timeout=10):
+    # 同意画面が出ておらず同意済みCookieがあれば探さない（--profile-dir で前回の同意を引き継いだ場合など）
+    if not consent_page_shown(driver):
+        if has_consent_cookie(driver):
+            return False
+        if driver in _NO_CONSENT_SEEN:
+            timeout = min(timeout, 1.0)
     btn_xpaths = [
         '//button[contains(.,"同意して続行")]',
         '//button[contains(.,"同意する")]',
@@ -130,10 +339,11 @@ def handle_google_consent(driver, timeout=10):
         time.sleep(0.4)
     with suppress(Exception):
         driver.switch_to.default_content()
+    _NO_CONSENT_SEEN.add(driver)
     return False
 
 def open_maps_home(driver, max_attempts=3):
-    MAPS_URL = "https://www.google.co.jp/maps?hl=ja"
+    MAPS_URL = f"{MAPS_BASE_URL}/maps?hl=ja"
     for attempt in range(1, max_attempts + 1):
         driver.get(MAPS_URL)
         with suppress(Exception):
@@ -155,8 +365,7 @@ def open_maps_home(driver, max_attempts=3):
 
 # ===== 店名・レビュー =====
 def get_place_name(driver):
-    name_selectors = ['h1.DUwDvf.lfPIob','h1.fontHeadlineLarge','h1[aria-level="1"]','h1[role="heading"]','[data-attrid="title"] span']
-    for css in name_selectors:
+    for css in NAME_SELECTORS:
         try:
             el = WebDriverWait(driver, 6).until(EC.visibility_of_element_located((By.CSS_SELECTOR, css)))
             txt = (el.text or "").strip()
@@ -205,34 +414,38 @@ def get_category(driver):
     return ""
 
 # ===== HP / SNS =====
+def pick_website_and_socials(primary_href, hrefs):
+    """公式サイト候補（authorityリンク）とパネル内のhref列からHP・SNSを振り分ける"""
+    website = clean_href(primary_href or ""); socials = []
+    seen = set()
+    for raw in hrefs:
+        href = clean_href(raw or "")
+        if not href or href in seen: continue
+        seen.add(href)
+        low = href.lower()
+        if low.startswith(("tel:", "javascript:", "mailto:")): continue
+        if "/maps/dir" in low or "/maps/reserve" in low or ("/maps/place/" in low and "google." in low): continue
+        if is_social_url(href): socials.append(href); continue
+        if not website and not is_block_website(href): website = href
+    return website, " ".join(dict.fromkeys(socials))
+
 def get_website_and_socials(driver):
-    website = ""; socials = []
+    primary = ""
     try:
         a = find_first(driver, [
             (By.CSS_SELECTOR, 'a[data-item-id="authority"]'),
             (By.CSS_SELECTOR, 'a[aria-label^="ウェブサイト:"]'),
             (By.XPATH, '//a[starts-with(@aria-label, "ウェブサイト:")]')
         ])
-        if a:
-            href = clean_href(a.get_attribute("href") or "")
-            if href: website = href
+        if a: primary = a.get_attribute("href") or ""
     except Exception: pass
     try: anchors = wait_css(driver, 'div[role="main"]', 10).find_elements(By.CSS_SELECTOR, 'a[href]')
     except Exception: anchors = driver.find_elements(By.CSS_SELECTOR, 'a[href]')
-    seen = set()
+    hrefs = []
     for a in anchors:
-        try:
-            href = clean_href(a.get_attribute("href") or "")
-            if not href or href in seen: continue
-            seen.add(href)
-            low = href.lower()
-            if low.startswith(("tel:", "javascript:", "mailto:")): continue
-            if "/maps/dir" in low or "/maps/reserve" in low or ("/maps/place/" in low and "google." in low): continue
-            if is_social_url(href): socials.append(href); continue
-            if not website and not is_block_website(href): website = href
-        except Exception:
-            continue
-    return website, " ".join(dict.fromkeys(socials))
+        with suppress(Exception):
+            hrefs.append(a.get_attribute("href") or "")
+    return pick_website_and_socials(primary, hrefs)
 
 # ===== 緯度・経度 =====
 def parse_coords_from_url(url):
@@ -243,20 +456,331 @@ def parse_coords_from_url(url):
         return (b, a) if ("2d" in pat and "3d" in pat) else (a, b)
     return None
 
-def parse_coords_from_ogimage(driver):
+def parse_coords_from_ogimage_url(url):
     try:
-        og = driver.find_element(By.CSS_SELECTOR, 'meta[property="og:image"]')
-        url = og.get_attribute("content") or ""
-        qs = urlparse(url).query
-        center = parse_qs(qs).get("center", [""])[0]
+        center = parse_qs(urlparse(url or "").query).get("center", [""])[0]
         if center and "," in center:
             lat, lon = center.split(",", 1)
             return float(lat), float(lon)
     except Exception: pass
     return None
 
+def parse_coords_from_ogimage(driver):
+    try:
+        og = driver.find_element(By.CSS_SELECTOR, 'meta[property="og:image"]')
+        return parse_coords_from_ogimage_url(og.get_attribute("content") or "")
+    except Exception: pass
+    return None
+
+# ===== 住所 =====
+def guess_address_line(main_text):
+    """パネル本文から住所らしい行を推定（〒を含む行→都道府県名で始まる行→都道府県+市区町村を含む最長行）"""
+    lines = [l.strip() for l in (main_text or "").split("\n") if l.strip()]
+    for l in lines:
+        if "〒" in l: return l
+    with suppress(Exception):
+        prefs = area_index().pref_trie
+        for l in lines:
+            if _trie_longest(prefs, ADDRESS_PREFIX_RE.sub("", normalize_address_text(l)))[0]: return l
+    cand = [l for l in lines if any(x in l for x in ["県","府","道","都"]) and any(y in l for y in ["市","区","町","村"])]
+    return max(cand, key=len) if cand else ""
+
+def normalize_address_text(address):
+    """全角英数字・空白を半角にし（NFKC）、ハイフン類を "-" にそろえる"""
+    s = unicodedata.normalize("NFKC", address or "")
+    return re.sub(r"\s+", " ", ADDRESS_HYPHEN_RE.sub("-", s)).strip()
+
+def split_postal(address):
+    """住所から郵便番号を切り出して (postal, address) を返す"""
+    address = normalize_address_text(address)
+    m = POSTAL_RE.search(address)
+    if not m: return "", address
+    postal = m.group(1)
+    return postal, address.replace("〒" + postal, "").replace(postal, "").strip()
+
+def _trie_insert(trie, word, value):
+    node = trie
+    for ch in word:
+        node = node.setdefault(ch, {})
+    node[""] = value
+
+def _trie_longest(trie, s):
+    """s の先頭に一致する最長の語を (値, 長さ) で返す（無ければ (None, 0)）"""
+    node, found = trie, (None, 0)
+    for i, ch in enumerate(s):
+        node = node.get(ch)
+        if node is None:
+            break
+        if "" in node:
+            found = (node[""], i + 1)
+    return found
+
+def same_area(a, b):
+    """市区町村名どうしの一致（"堺市" と "堺市北区"、UI の "高市" と "高市郡" のような前方一致も同じとみなす）"""
+    return bool(a and b) and (a.startswith(b) or b.startswith(a))
+
+class AreaIndex:
+    """
+    都道府県→市区町村の表（jp_areas.json）から作るトライ。住所を都道府県・市区町村・それ以降に分ける。
+    町村の前の郡名（"高市郡高取町"）と政令指定都市の区（"名古屋市中区"）は市区町村に含める。
+    表で読めない市区町村は推定せず空にする（番地側に残る）。
+    """
+
+    def __init__(self, data):
+        self.pref_trie = {}
+        self.city_trie = {}
+        self.city_prefs = defaultdict(set)
+        for pref, cities in data.items():
+            _trie_insert(self.pref_trie, pref, pref)
+            for city in cities:
+                self.city_prefs[city].add(pref)
+                _trie_insert(self.city_trie, city, city)
+
+    @classmethod
+    def load(cls, path=AREA_DATA_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def split(self, address):
+        """住所を {"prefecture","city","street"} に分ける（正規化済みの文字列で返す）"""
+        s = ADDRESS_PREFIX_RE.sub("", normalize_address_text(address))
+        pref, n = _trie_longest(self.pref_trie, s)
+        rest = s[n:].lstrip()
+        city, n = self._city(rest, pref)
+        gun = ""
+        if not city:
+            gun, city, n = self._gun_city(rest, pref)
+        if city and not pref and len(self.city_prefs.get(city, ())) == 1:
+            pref = next(iter(self.city_prefs[city]))
+        if city in DESIGNATED_CITIES:
+            m = WARD_RE.match(rest[n:])
+            if m:
+                gun, city, n = "", city + m.group(0), n + m.end()
+        return {"prefecture": pref or "", "city": gun + (city or ""), "street": rest[n:].strip()}
+
+    def _city(self, s, pref):
+        """s の先頭の市区町村名と長さ（同名の別県の市区町村＝府中市など、は一致としない）"""
+        city, n = _trie_longest(self.city_trie, s)
+        if city and pref and pref not in self.city_prefs[city]:
+            return None, 0
+        return city, n
+
+    def _gun_city(self, s, pref):
+        """"○○郡△△町" を (郡名, 町村名, 長さ) にする。エリア名の "○○郡" だけなら (郡名, "", 長さ)"""
+        for k, ch in enumerate(s[:8]):
+            if ch != "郡" or k == 0:
+                continue
+            town, n = self._city(s[k + 1:], pref)
+            if town and town[-1] in "町村":
+                return s[:k + 1], town, k + 1 + n
+            if not s[k + 1:].strip():
+                return s[:k + 1], "", k + 1
+        return "", None, 0
+
+_area_index = None
+
+def area_index():
+    global _area_index
+    if _area_index is None:
+        _area_index = AreaIndex.load()
+    return _area_index
+
+class AreaCheck:
+    """
+    出力前に行の住所を都道府県・市区町村・番地へ分け、検索したエリアと合っているか確かめる。
+    住所が表で別の市区町村と読めた行だけを、そのエリアも今回の検索対象なら付け替え、対象外なら dropped に数えて捨てる。
+    エリア名・住所のどちらかが市区町村として読めないとき（表にない地名・独自のエリア名）は判定せず残し、
+    unverified に数える。
+    """
+
+    def __init__(self, areas, drop=True, index=None):
+        self.index = index or area_index()
+        self.drop = drop
+        self.dropped = 0
+        self.moved = 0
+        self.unverified = 0
+        self.areas = {}
+        for name in areas:
+            parts = self.index.split(name)
+            if parts["city"]:
+                self.areas[name] = parts
+
+    def _matches(self, area, parts):
+        want = self.areas.get(area)
+        if not want:
+            return None
+        if want["prefecture"] and parts["prefecture"] and want["prefecture"] != parts["prefecture"]:
+            return False
+        return same_area(want["city"], parts["city"])
+
+    def apply(self, row):
+        """row に prefecture / city / street を付ける。捨てる行なら None を返す"""
+        parts = self.index.split(row.get("address") or "")
+        row.update(parts)
+        if not self.drop:
+            return row
+        area = row.get("area") or ""
+        matched = self._matches(area, parts) if parts["city"] else None
+        if matched is None:
+            self.unverified += 1
+        if matched is not False:
+            return row
+        for name in self.areas:
+            if self._matches(name, parts):
+                row["area"] = name
+                if "areas" in row and name not in row["areas"]:
+                    row["areas"].append(name)
+                self.moved += 1
+                return row
+        self.dropped += 1
+        return None
+
+    def summary(self):
+        return (f"🗾 エリア照合: 別エリアへ付け替え {self.moved}件 / エリア外で除外 {self.dropped}件"
+                f" / 市区町村を判定できず残した {self.unverified}件")
+
+def build_row(name, category, phone, postal, address, website, socials, reviews, latlon, url):
+    lat, lon = latlon if latlon else (None, None)
+    return {
+        "company_name": name,
+        "category": category,
+        "phone": phone,
+        "postal_code": postal,
+        "address": address,
+        "website_url": website,
+        "sns_urls": socials,
+        "review_count": int(reviews) if reviews else 0,
+        "latitude": round(lat, 6) if lat is not None else None,
+        "longitude": round(lon, 6) if lon is not None else None,
+        "google_maps_url": url,
+    }
+
+# ===== DOMスナップショット（1往復で必要な情報をまとめて取得） =====
+PLACE_SNAPSHOT_JS = r"""
+const sel = arguments[0];
+const vis = el => !!(el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length));
+const txt = el => ((el && el.innerText) || "").trim();
+const firstOf = (list, visibleOnly) => {
+    for (const css of list) {
+        for (const el of document.querySelectorAll(css)) {
+            if (!visibleOnly || vis(el)) return el;
+        }
+    }
+    return null;
+};
+const headings = [];
+for (const css of sel.name) {
+    for (const el of document.querySelectorAll(css)) {
+        if (vis(el) && txt(el)) { headings.push(txt(el)); break; }
+    }
+}
+const main = document.querySelector('div[role="main"]');
+const cat = firstOf(sel.category, false);
+const web = firstOf(sel.website, false);
+const addr = firstOf(sel.address, false);
+const labels = [];
+for (const el of document.querySelectorAll('[aria-label]')) {
+    const l = el.getAttribute('aria-label');
+    if (l) labels.push(l);
+}
+const hrefs = [];
+for (const a of (main || document).querySelectorAll('a[href]')) hrefs.push(a.href);
+const tels = [];
+for (const a of document.querySelectorAll('a[href^="tel:"]')) tels.push(a.getAttribute('href'));
+const meta = {};
+for (const m of document.querySelectorAll('meta[property],meta[name]')) {
+    const k = m.getAttribute('property') || m.getAttribute('name');
+    if (k && !(k in meta)) meta[k] = m.getAttribute('content') || "";
+}
+return {
+    url: location.href,
+    title: document.title || "",
+    headings: headings,
+    category: cat ? txt(cat) : null,
+    website: web ? (web.href || "") : "",
+    address_label: addr ? (addr.getAttribute('aria-label') || "") : "",
+    labels: labels,
+    hrefs: hrefs,
+    tels: tels,
+    main_text: main ? txt(main) : "",
+    meta: meta,
+};
+"""
+
+PLACE_SNAPSHOT_SELECTORS = {
+    "name": NAME_SELECTORS,
+    "category": CATEGORY_SELECTORS,
+    "website": WEBSITE_SELECTORS,
+    "address": ADDRESS_SELECTORS,
+}
+
+def take_place_snapshot(driver):
+    """詳細パネルの必要情報を execute_script 1回で取得（失敗時は None）"""
+    try:
+        snap = driver.execute_script(PLACE_SNAPSHOT_JS, PLACE_SNAPSHOT_SELECTORS)
+    except Exception:
+        return None
+    return snap if isinstance(snap, dict) else None
+
+def parse_place_snapshot(snap):
+    """take_place_snapshot の結果から行を組み立てる（ブラウザ不要の純Python処理）"""
+    meta = snap.get("meta") or {}
+    labels = snap.get("labels") or []
+    main_text = snap.get("main_text") or ""
+
+    name = next((h for h in snap.get("headings") or [] if h), "")
+    if not name: name = (meta.get("og:title") or "").strip()
+    if not name:
+        title = (snap.get("title") or "").strip()
+        name = title.split(" - ")[0].strip() if " - " in title else title
+
+    category = (snap.get("category") or "").strip()
+
+    phone = ""
+    for href in snap.get("tels") or []:
+        if href and href.startswith("tel:"):
+            phone = normalize_hyphen(href.replace("tel:", "").strip()); break
+    if not phone:
+        label = next((l for l in labels if l.startswith("電話番号:")), "")
+        m = TEL_RE.search(label) or TEL_RE.search(main_text)
+        if m: phone = normalize_hyphen(m.group(0))
+
+    address = (snap.get("address_label") or "").replace("住所:", "").strip()
+    if not address:
+        address = guess_address_line(main_text)
+    postal, address = split_postal(address)
+
+    website, socials = pick_website_and_socials(snap.get("website") or "", snap.get("hrefs") or [])
+
+    reviews = ""
+    for text in labels + [main_text]:
+        m = REVIEWS_RE.search(text or "")
+        if m: reviews = m.group(1).replace(",", ""); break
+
+    url = snap.get("url") or ""
+    latlon = parse_coords_from_url(url) or parse_coords_from_ogimage_url(meta.get("og:image") or "")
+
+    return build_row(name, category, phone, postal, address, website, socials, reviews, latlon, url)
+
 # ===== 抽出本体 =====
 def extract_details_from_current_page(driver):
+    snap = take_place_snapshot(driver)
+    if snap:
+        return parse_place_snapshot(snap)
+    return extract_details_via_webdriver(driver)
+
+def extract_rendered_place(driver, place_url, try_source=False):
+    """
+    見出しが表示されたページから抽出して (row, 取得元) を返す。
+    try_source=True（JSから埋め込みデータが見えなかったページ）なら page_source の埋め込みデータを先に試す。
+    """
+    row = try_source and extract_embedded_place(driver, place_url, from_source=True)
+    if row:
+        return row, "embedded"
+    return extract_details_from_current_page(driver), "dom"
+
+def extract_details_via_webdriver(driver):
+    """スナップショットが取れなかった場合の従来方式（要素ごとにWebDriverへ問い合わせ）"""
     name = get_place_name(driver)
     category = get_category(driver)
 
@@ -283,7 +807,7 @@ def extract_details_from_current_page(driver):
             if m: phone = normalize_hyphen(m.group(0))
         except Exception: pass
 
-    address = ""; postal = ""
+    address = ""
     try:
         addr_btn = find_first(driver, [
             (By.CSS_SELECTOR, 'button[aria-label^="住所:"]'),
@@ -294,49 +818,396 @@ def extract_details_from_current_page(driver):
             address = (addr_btn.get_attribute("aria-label") or "").replace("住所:", "").strip()
     except Exception: pass
     if not address:
-        try:
-            main = wait_css(driver, 'div[role="main"]', 10)
-            lines = [l.strip() for l in safe_text(main).split("\n") if l.strip()]
-            addr_line = ""
-            for l in lines:
-                if "〒" in l: addr_line = l; break
-            if not addr_line:
-                cand = [l for l in lines if any(x in l for x in ["県","府","道","都"]) and any(y in l for y in ["市","区","町","村"])]
-                if cand: addr_line = max(cand, key=len)
-            address = addr_line or ""
-        except Exception: pass
-    address = normalize_hyphen(address)
-    m = POSTAL_RE.search(address)
-    if m:
-        postal = m.group(1)
-        address = address.replace("〒" + postal, "").replace(postal, "").strip()
+        with suppress(Exception):
+            address = guess_address_line(safe_text(wait_css(driver, 'div[role="main"]', 10)))
+    postal, address = split_postal(address)
 
     website, socials = get_website_and_socials(driver)
     reviews = get_reviews_count(driver)
 
-    lat, lon = None, None
-    try:
+    latlon = None
+    with suppress(Exception):
         latlon = parse_coords_from_url(driver.current_url) or parse_coords_from_ogimage(driver)
-        if latlon: lat, lon = latlon
-    except Exception: pass
 
-    return {
-        "company_name": name,
-        "category": category,
-        "phone": phone,
-        "postal_code": postal,
-        "address": address,
-        "website_url": website,
-        "sns_urls": socials,
-        "review_count": int(reviews) if reviews else 0,
-        "latitude": round(lat, 6) if lat is not None else None,
-        "longitude": round(lon, 6) if lon is not None else None,
-        "google_maps_url": driver.current_url,
-    }
+    return build_row(name, category, phone, postal, address, website, socials, reviews, latlon, driver.current_url)
+
+# ===== 埋め込みデータからの高速抽出 =====
+EMBEDDED_MODE = True  # main() で --dom-only 指定時に False
+
+# プレイスページの window.APP_INITIALIZATION_STATE[3] には ")]}'" で始まるJSON文字列が入っており、
+# そのうちプレイス詳細の配列（[6]）に表示前の時点で名前・住所・電話などが揃っている。
+# 遷移前の文書（タブプールの使い回し時）は data-scraper-stale 印で除外する。
+EMBEDDED_STATE_JS = r"""
+const root = document.documentElement;
+if (!root || root.hasAttribute('data-scraper-stale')) return null;
+const s = window.APP_INITIALIZATION_STATE;
+if (!s || !Array.isArray(s[3])) return null;
+const out = [];
+for (const v of s[3]) if (typeof v === 'string' && v.startsWith(")]}'")) out.push(v);
+return out.length ? out : null;
+"""
+EMBEDDED_READY_JS = r"""
+const root = document.documentElement;
+const s = window.APP_INITIALIZATION_STATE;
+return !!(root && !root.hasAttribute('data-scraper-stale') && s && Array.isArray(s[3]));
+"""
+EMBEDDED_STATE_RE = re.compile(r"APP_INITIALIZATION_STATE=(\[.*?\]);window\.APP_", re.S)
+
+def _dig(obj, *path):
+    for i in path:
+        try:
+            obj = obj[i]
+        except (IndexError, KeyError, TypeError):
+            return None
+    return obj
+
+def embedded_payloads_from_html(html):
+    """page_source から APP_INITIALIZATION_STATE[3] の ")]}'" 文字列を取り出す"""
+    m = EMBEDDED_STATE_RE.search(html or "")
+    if not m: return []
+    try:
+        state = json.loads(m.group(1))
+    except ValueError:
+        return []
+    return [v for v in (_dig(state, 3) or []) if isinstance(v, str) and v.startswith(")]}'")]
+
+def _embedded_social_urls(info):
+    """プレイス情報の中の SNS リンク（パネルのリンク欄に並ぶもの）を出現順に集める"""
+    found = []
+    stack = [info]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, list):
+            stack.extend(reversed(obj))
+        elif isinstance(obj, str) and obj.startswith(("http://", "https://")):
+            href = clean_href(obj)
+            if is_social_url(href):
+                found.append(href)
+    return found
+
+def parse_embedded_place(payloads, place_url=""):
+    """
+    埋め込みデータから行を組み立てる（ブラウザ不要の純Python処理）。
+    配列の位置は非公開仕様なので、名前・座標・URLとの一致を検証して通らなければ None（DOM抽出へ）。
+    """
+    fid = canonical_place_id(place_url)
+    for raw in payloads or []:
+        if not isinstance(raw, str) or not raw.startswith(")]}'"):
+            continue
+        if fid and not fid.startswith("cid:") and fid not in raw.lower():
+            continue  # 別のプレイスのデータ
+        try:
+            data = json.loads(raw[4:])
+        except ValueError:
+            continue
+        info = _dig(data, 6)
+        if not isinstance(info, list):
+            continue
+
+        name = _dig(info, 11)
+        if not isinstance(name, str) or not name.strip():
+            continue
+        cats = _dig(info, 13)
+        category = cats[0] if isinstance(cats, list) and cats and isinstance(cats[0], str) else ""
+
+        lat, lon = _dig(info, 9, 2), _dig(info, 9, 3)
+        latlon = None
+        if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                continue
+            latlon = (float(lat), float(lon))
+
+        address = ""
+        full = _dig(info, 39)
+        lines = _dig(info, 2)
+        if isinstance(full, str) and full.strip():
+            address = full.strip()
+        elif isinstance(lines, list):
+            address = " ".join(x for x in lines if isinstance(x, str))
+        postal, address = split_postal(re.sub(r"^日本、\s*", "", address))
+
+        phone = ""
+        tel = _dig(info, 178, 0, 0)
+        if isinstance(tel, str):
+            m = TEL_RE.search(tel.replace(" ", ""))
+            if m: phone = normalize_hyphen(m.group(0))
+
+        site = _dig(info, 7, 0)
+        hrefs = ([site] if isinstance(site, str) else []) + _embedded_social_urls(info)
+        website, socials = pick_website_and_socials("", hrefs)
+
+        reviews = _dig(info, 4, 8)
+        if not isinstance(reviews, int):
+            reviews = 0
+
+        if not (address or phone or latlon):
+            continue
+        return build_row(name.strip(), category, phone, postal, address, website, socials, reviews,
+                         latlon, place_url)
+    return None
+
+def embedded_ready(driver):
+    """埋め込みデータが読み込まれたか（軽い確認のみ。本体の転送・解析は extract_embedded_place）"""
+    if not EMBEDDED_MODE: return False
+    try:
+        return bool(driver.execute_script(EMBEDDED_READY_JS))
+    except Exception:
+        return False
+
+def extract_embedded_place(driver, place_url, from_source=False):
+    """
+    現在のタブの埋め込みデータから抽出する（未読み込み・検証失敗は None）。
+    from_source=True ならJSで取れないときに page_source も解析する（重いので1ページ1回まで）。
+    """
+    if not EMBEDDED_MODE: return None
+    payloads = None
+    with suppress(Exception):
+        payloads = driver.execute_script(EMBEDDED_STATE_JS)
+    if not payloads and from_source:
+        with suppress(Exception):
+            payloads = embedded_payloads_from_html(driver.page_source)
+    if not payloads: return None
+    return parse_embedded_place(payloads, place_url)
+
+# ===== プレイスID・キャッシュ =====
+def canonical_place_id(url):
+    """
+    Maps URLから安定したプレイスIDを取り出す（取れなければ空文字）。
+    /@lat,lng,zoom やクエリは検索ごとに変わるので使わない。
+    """
+    if not url: return ""
+    m = PLACE_FID_RE.search(url)
+    if m: return m.group(1).lower()
+    with suppress(Exception):
+        qs = parse_qs(urlparse(url).query)
+        if qs.get("cid"): return "cid:" + qs["cid"][0]
+        if qs.get("ftid"): return qs["ftid"][0].lower()
+    return ""
+
+def place_key(url):
+    """
+    1回の実行内の重複判定用キー。同じプレイスなら URL の形が違っても同じ値になるようにする。
+    - FID（0x…:0x…）の後半と ?cid= は同じ CID なので "cid:<10進>" にそろえる
+    - それ以外は ftid / place_id / ナレッジグラフID（!16s/g/…）、最後は /@… と data= を除いたURL
+      （パスは店名だけなので、同名の別店舗を分けるため座標を小数4桁＝約10mで付ける）
+    """
+    if not url: return ""
+    fid = canonical_place_id(url)
+    if fid.startswith("cid:"):
+        return fid
+    if fid:
+        with suppress(ValueError):
+            return "cid:%d" % int(fid.split(":")[1], 16)
+        return fid
+    m = PLACE_MID_RE.search(url)
+    if m: return "mid:" + m.group(1).replace("%2F", "/")
+    with suppress(Exception):
+        parsed = urlparse(url)
+        qs = parse_qs(parsed.query)
+        if qs.get("query_place_id"): return "pid:" + qs["query_place_id"][0]
+        q = qs.get("q", [""])[0]
+        if q.startswith("place_id:"): return "pid:" + q[len("place_id:"):]
+        key = "url:" + PLACE_URL_NOISE_RE.sub("", parsed.path).rstrip("/")
+        # data= の !3d!4d（プレイスの座標）を優先し、無ければ /@（表示位置）
+        m = re.search(COORD_URL_PATTERNS[1], url)
+        latlon = (float(m.group(1)), float(m.group(2))) if m else parse_coords_from_url(url)
+        if latlon:
+            key += "@%.4f,%.4f" % latlon
+        return key
+    return "url:" + url
+
+def known_index(entries):
+    """
+    既知プレイスの一覧（Maps URL / FID / "cid:…" / CID の数字）を {place_key: 元の文字列} にする。
+    空行と # 始まりの行は無視する。
+    """
+    index = {}
+    for raw in entries:
+        line = (raw or "").strip()
+        if not line or line.startswith("#"):
+            continue
+        if "://" in line or line.startswith("/maps"):
+            key = place_key(line)
+        elif PLACE_FID_RE.search("!1s" + line):
+            key = place_key("!1s" + line)
+        elif line.isdigit():
+            key = "cid:" + line
+        else:
+            key = line  # cid: / pid: / mid: などのキーをそのまま
+        if key:
+            index.setdefault(key, line)
+    return index
+
+def load_known_places(path):
+    """--known のファイル（1行1件）を読み込む"""
+    with open(path, encoding="utf-8") as f:
+        return known_index(f)
+
+class PlaceCache:
+    """
+    抽出済みプレイスのローカルキャッシュ（SQLite）。
+    place_key（実行内の重複判定と同じキー）で行を保存し、TTL切れ・上限超過分は evict() で削除する。
+    "url:" のキー（プレイスIDを含まないURL）は確実に同じプレイスと言えないので保存しない。
+    area / industry は実行ごとに付け直すので保存しない。
+    """
+
+    def __init__(self, path, ttl_days=CACHE_TTL_DAYS, max_entries=CACHE_MAX_ENTRIES):
+        dirname = os.path.dirname(os.path.abspath(path))
+        os.makedirs(dirname, exist_ok=True)
+        self.ttl = ttl_days * 86400
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS places (
+                place_id TEXT PRIMARY KEY,
+                row TEXT NOT NULL,
+                scraped_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_places_scraped_at ON places(scraped_at)")
+        self.conn.commit()
+
+    @staticmethod
+    def _key(url):
+        key = place_key(url)
+        return "" if key.startswith("url:") else key
+
+    def get(self, url):
+        pid = self._key(url)
+        with self.lock:
+            cur = None
+            if pid:
+                cur = self.conn.execute(
+                    "SELECT row FROM places WHERE place_id = ? AND scraped_at >= ?",
+                    (pid, time.time() - self.ttl),
+                ).fetchone()
+            if not cur:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(cur[0])
+
+    def put(self, url, row):
+        pid = self._key(url) or self._key(row.get("google_maps_url"))
+        if not pid: return
+        data = {k: v for k, v in row.items() if k not in ("area", "industry")}
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO places (place_id, row, scraped_at) VALUES (?, ?, ?)",
+                (pid, json.dumps(data, ensure_ascii=False), time.time()),
+            )
+            self.conn.commit()
+
+    def evict(self):
+        """TTL切れを削除し、件数上限を超えた分は古い順に削除する"""
+        with self.lock:
+            removed = self.conn.execute(
+                "DELETE FROM places WHERE scraped_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+            if self.max_entries:
+                removed += self.conn.execute(
+                    "DELETE FROM places WHERE place_id IN ("
+                    "SELECT place_id FROM places ORDER BY scraped_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+            self.conn.commit()
+        return removed
+
+    def close(self):
+        with suppress(Exception):
+            self.conn.close()
+
+def extract_place(driver, place_url, cache=None, timeout=None, on_timeout=None):
+    """キャッシュにあればそれを返し、なければタブを開いて抽出する"""
+    if cache:
+        row = cache.get(place_url)
+        if row: return row
+    row = open_and_extract(driver, place_url, timeout, on_timeout)
+    if cache and row and row.get("company_name"):
+        cache.put(place_url, row)
+    return row
+
+# ===== 通信量削減（--lean）・ページ計測 =====
+LEAN_MODE = False  # main() で --lean 指定時に True
+
+# 抽出に使わないリソース（地図タイル・写真・フォント・計測系）
+LEAN_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp4", "*.webm",
+    "*/maps/vt?*", "*/maps/vt/*", "*/kh/v=*", "*/maps/preview/image*",
+    "*googleusercontent.com/p/*", "*ggpht.com*", "*streetviewpixels*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*/gen_204*", "*/log?*",
+]
+
+def apply_lean_profile(driver):
+    """現在のタブに CDP のリクエストブロックを設定する（タブごとに必要）"""
+    with suppress(Exception):
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+
+PAGE_STATS_JS = r"""
+const nav = performance.getEntriesByType('navigation')[0];
+let bytes = nav ? (nav.transferSize || 0) : 0;
+let n = 0;
+for (const r of performance.getEntriesByType('resource')) { bytes += r.transferSize || 0; n++; }
+return {bytes: bytes, resources: n};
+"""
+
+class PageStats:
+    """
+    プレイスページ1件ごとの転送量と表示完了までの時間を集計する。
+    転送量は Resource Timing の transferSize 合計（クロスオリジンで0になる分は含まれない概算値）。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.bytes = 0
+        self.resources = 0
+        self.ready_ms = 0.0
+
+    def record(self, driver, ready_ms):
+        info = {}
+        with suppress(Exception):
+            info = driver.execute_script(PAGE_STATS_JS) or {}
+        self.add(info, ready_ms)
+
+    def add(self, info, ready_ms):
+        """PAGE_STATS_JS の結果を1件分加える"""
+        with self.lock:
+            self.count += 1
+            self.bytes += int(info.get("bytes") or 0)
+            self.resources += int(info.get("resources") or 0)
+            self.ready_ms += ready_ms
+
+    def summary(self):
+        with self.lock:
+            if not self.count: return ""
+            return (f"📶 ページ計測{'（lean）' if LEAN_MODE else ''}: {self.count}件 / "
+                    f"平均 {self.bytes / self.count / 1024:.0f} KB・"
+                    f"リソース {self.resources / self.count:.0f}件・"
+                    f"表示 {self.ready_ms / self.count:.0f} ms")
+
+page_stats = PageStats()
 
 # ===== タブを開いて抽出 =====
-def open_and_extract(driver, place_url):
-    TIMEOUT = CARD_LOAD_TIMEOUT
+def open_and_extract(driver, place_url, timeout=None, on_timeout=None):
+    """
+    新しいタブでプレイスを開いて抽出する。
+    timeout 省略時は scheduler の現在値。タイムアウト時に on_timeout があれば
+    on_timeout(place_url) を呼んで後回しにする（なければスキップ）。
+    --backend cdp では DevTools 直結で開く（接続できなければ以下の Selenium 方式）。
+    """
+    if BACKEND == "cdp":
+        conn = cdp_for(driver)
+        if conn:
+            return cdp_open_and_extract(driver, conn, place_url, timeout, on_timeout)
+    TIMEOUT = timeout or scheduler.timeout()
 
     def _seen_heading(drv):
         try:
@@ -372,40 +1243,78 @@ def open_and_extract(driver, place_url):
         base = driver.current_window_handle
 
     opened_new_tab = True
+    start = time.monotonic()
     try:
-        driver.execute_script("window.open(arguments[0], '_blank');", place_url)
-        time.sleep(0.6)
+        n_handles = len(driver.window_handles)
+        # leanモードでは空タブにブロック設定をしてから遷移する（新しいタブには設定が引き継がれないため）
+        driver.execute_script("window.open(arguments[0], '_blank');", "about:blank" if LEAN_MODE else place_url)
+        WebDriverWait(driver, 5, poll_frequency=0.05).until(lambda d: len(d.window_handles) > n_handles)
         driver.switch_to.window(driver.window_handles[-1])
+        if LEAN_MODE:
+            apply_lean_profile(driver)
+            driver.execute_script("location.replace(arguments[0]);", place_url)
     except Exception:
         opened_new_tab = False
         with suppress(Exception):
             driver.get("about:blank")
+        if LEAN_MODE:
+            apply_lean_profile(driver)
         with suppress(Exception):
             driver.get(place_url)
 
     row = None
-    start = time.monotonic()
+    fast_pending = EMBEDDED_MODE  # 埋め込みデータの解析は1ページ1回まで（検証に落ちたら描画を待つ）
     try:
         while True:
+            # 埋め込みデータが届いていれば描画を待たずに抽出する
+            if fast_pending and embedded_ready(driver):
+                fast_pending = False
+                ready_s = time.monotonic() - start
+                t0 = time.monotonic()
+                row = extract_embedded_place(driver, place_url)
+                if row:
+                    scheduler.observe(ready_s)
+                    health.observe(driver, ready_s)
+                    metrics.event("detail-open", ready_s, place_url, source="embedded")
+                    metrics.event("extract", time.monotonic() - t0, place_url, source="embedded")
+                    page_stats.record(driver, ready_s * 1000)
+                    break
             if _seen_heading(driver):
-                with suppress(Exception):
-                    row = extract_details_from_current_page(driver)
+                ready_s = time.monotonic() - start
+                metrics.event("detail-open", ready_s, place_url)
+                scheduler.observe(ready_s)
+                health.observe(driver, ready_s)
+                with metrics.phase("extract", place_url, source="dom") as ev:
+                    try:
+                        row, ev["source"] = extract_rendered_place(driver, place_url, try_source=fast_pending)
+                    except Exception:
+                        ev["outcome"] = "error"
+                page_stats.record(driver, ready_s * 1000)
                 break
 
             if _looks_blank(driver):
                 with suppress(Exception):
                     driver.execute_script("void 0")
 
-            if (time.monotonic() - start) >= TIMEOUT:
-                log(f"⏭ タイムアウト→スキップ: {place_url}")
+            elapsed = time.monotonic() - start
+            if elapsed >= TIMEOUT:
+                metrics.event("detail-open", elapsed, place_url, "timeout")
+                scheduler.observe_timeout(elapsed)
+                if on_timeout:
+                    log(f"⏭ タイムアウト({TIMEOUT:.0f}秒)→後で再試行: {place_url}")
+                    on_timeout(place_url)
+                else:
+                    log(f"⏭ タイムアウト→スキップ: {place_url}")
                 break
 
             try:
-                WebDriverWait(driver, 6).until(lambda d: _seen_heading(d))
+                WebDriverWait(driver, min(6, max(0.1, TIMEOUT - elapsed))).until(
+                    lambda d: _seen_heading(d) or (fast_pending and embedded_ready(d)))
             except Exception:
                 pass
     except Exception as e:
         log(f"⏭ 例外スキップ: {place_url} / {e}")
+        metrics.event("detail-open", time.monotonic() - start, place_url, "error")
         row = None
     finally:
         if opened_new_tab:
@@ -425,78 +1334,684 @@ def open_and_extract(driver, place_url):
 
     return row
 
-# ===== 一覧：スクロール・URL収集・クリック補完 =====
-def collect_place_urls_from_feed(driver, feed, expect_min=0):
-    urls = set()
-    try:
-        for a in feed.find_elements(By.CSS_SELECTOR, 'a.hfpxzc'):
-            href = a.get_attribute("href") or ""
-            if "/maps/place/" in href: urls.add(href)
-    except Exception: pass
-    try:
-        for a in feed.find_elements(By.CSS_SELECTOR, 'a[href*="/maps/place/"]'):
-            href = a.get_attribute("href") or ""
-            if href: urls.add(href)
-    except Exception: pass
+# ===== タブプール（1つのChrome内で複数プレイスの読み込みを重ねる） =====
+TAB_READY_JS = r"""
+const root = document.documentElement;
+if (!root || root.hasAttribute('data-scraper-stale')) return false;
+for (const css of arguments[0]) {
+    for (const el of document.querySelectorAll(css)) {
+        if (el.offsetWidth || el.offsetHeight || el.getClientRects().length) return true;
+    }
+}
+return false;
+"""
+# 遷移前の文書に印を付けておき、新しい文書に切り替わるまで前のページの見出しを「表示済み」と誤認しないようにする
+TAB_NAVIGATE_JS = "document.documentElement && document.documentElement.setAttribute('data-scraper-stale', '1'); location.replace(arguments[0]);"
 
-    cards_total = len(driver.find_elements(By.CSS_SELECTOR, 'div.Nv2PK'))
-    for idx in range(cards_total):
-        if expect_min and len(urls) >= expect_min: break
-        try:
-            card = driver.find_elements(By.CSS_SELECTOR, 'div.Nv2PK')[idx]
-        except Exception:
-            break
+class TabPool:
+    """
+    事前に開いたK個のタブを location.replace で使い回し、読み込みを並行させる。
+    1タブを抽出している間に他のタブは読み込みを進めるので、window.open / close の往復と
+    レンダラプロセスの生成・破棄がなくなる。見出しの表示確認はタブごとに行う。
+    """
+
+    def __init__(self, driver, size, timeout=None):
+        self.driver = driver
+        self.timeout = timeout
+        self.base = driver.current_window_handle
+        before = set(driver.window_handles)
+        for _ in range(size):
+            driver.execute_script("window.open('about:blank', '_blank');")
+        WebDriverWait(driver, 10, poll_frequency=0.05).until(lambda d: len(set(d.window_handles) - before) >= size)
+        self.tabs = [h for h in driver.window_handles if h not in before]
+        self.slots = {}  # handle -> (url, ctx, 開始時刻)
+        self.fast_tried = set()  # 埋め込みデータの解析を試したタブ（遷移ごとにリセット）
+        if LEAN_MODE:
+            for h in self.tabs:
+                driver.switch_to.window(h)
+                apply_lean_profile(driver)
+        self.park()
+
+    @property
+    def free(self):
+        return [h for h in self.tabs if h not in self.slots]
+
+    @property
+    def busy(self):
+        return len(self.slots)
+
+    def park(self):
+        """一覧タブ（元のウィンドウ）に戻る"""
         with suppress(Exception):
-            driver.execute_script("arguments[0].scrollIntoView({block:'center'});", card)
-            time.sleep(0.2)
+            self.driver.switch_to.window(self.base)
 
-        try:
-            a = card.find_element(By.CSS_SELECTOR, 'a.hfpxzc')
-            href = a.get_attribute("href") or ""
-            if "/maps/place/" in href: urls.add(href); continue
-        except Exception:
+    def submit(self, url, ctx=None):
+        h = self.free[0]
+        self.driver.switch_to.window(h)
+        self.driver.execute_script(TAB_NAVIGATE_JS, url)
+        self.fast_tried.discard(h)
+        self.slots[h] = (url, ctx, time.monotonic())
+
+    def poll(self):
+        """読み込みの済んだタブを抽出し、[(url, ctx, row, タイムアウトか)] を返す"""
+        done = []
+        timeout = self.timeout or scheduler.timeout()
+        for h, (url, ctx, start) in list(self.slots.items()):
+            elapsed = time.monotonic() - start
+            ready = False
+            fast = None
             try:
-                a = card.find_element(By.CSS_SELECTOR, 'a[href*="/maps/place/"]')
-                href = a.get_attribute("href") or ""
-                if "/maps/place/" in href: urls.add(href); continue
+                self.driver.switch_to.window(h)
+                if h not in self.fast_tried and embedded_ready(self.driver):
+                    self.fast_tried.add(h)
+                    t0 = time.monotonic()
+                    fast = extract_embedded_place(self.driver, url)
+                    fast_s = time.monotonic() - t0
+                ready = fast or self.driver.execute_script(TAB_READY_JS, NAME_SELECTORS[:4])
             except Exception:
                 pass
+            timed_out = False
+            if fast:
+                scheduler.observe(elapsed)
+                health.observe(self.driver, elapsed)
+                metrics.event("detail-open", elapsed, url, source="embedded")
+                metrics.event("extract", fast_s, url, source="embedded")
+                page_stats.record(self.driver, elapsed * 1000)
+                row = fast
+            elif ready:
+                metrics.event("detail-open", elapsed, url)
+                scheduler.observe(elapsed)
+                health.observe(self.driver, elapsed)
+                row = None
+                with metrics.phase("extract", url, source="dom") as ev:
+                    try:
+                        # 埋め込みデータをまだ試していないタブは open_and_extract と同じく page_source から先に試す
+                        row, ev["source"] = extract_rendered_place(self.driver, url,
+                                                                   try_source=EMBEDDED_MODE and h not in self.fast_tried)
+                    except Exception:
+                        ev["outcome"] = "error"
+                page_stats.record(self.driver, elapsed * 1000)
+            elif elapsed >= timeout:
+                metrics.event("detail-open", elapsed, url, "timeout")
+                scheduler.observe_timeout(elapsed)
+                row = None
+                timed_out = True
+                with suppress(Exception):
+                    self.driver.execute_script(TAB_NAVIGATE_JS, "about:blank")
+            else:
+                continue
+            del self.slots[h]
+            done.append((url, ctx, row, timed_out))
+        return done
+
+    def abandon(self):
+        """処理中のタスクを手放して [(url, ctx)] を返す"""
+        pending = [(url, ctx) for url, ctx, _ in self.slots.values()]
+        self.slots.clear()
+        return pending
+
+    def close(self):
+        for h in self.tabs:
+            with suppress(Exception):
+                self.driver.switch_to.window(h)
+                self.driver.close()
+        self.park()
+
+def run_tab_pipeline(tabs, next_task, on_done, cache=None, on_timeout=None):
+    """
+    タブプールでURLを順に処理する。
+    - next_task(block) は (url, ctx) / False（今は無い）/ None（もう無い）を返す
+    - on_done(url, ctx, row) は1件ごとに呼ばれる（キャッシュヒットはタブを使わず即時）
+    - タイムアウトした分は on_timeout(url, ctx) があればそちらへ（なければ row=None で on_done）
+    """
+    exhausted = False
+    idle = 0.02
+    try:
+        while True:
+            while not exhausted and tabs.free:
+                task = next_task(not tabs.busy)
+                if task is None:
+                    exhausted = True
+                    break
+                if task is False:
+                    break
+                url, ctx = task
+                row = cache.get(url) if cache else None
+                if row:
+                    on_done(url, ctx, row)
+                    continue
+                tabs.submit(url, ctx)
+            if exhausted and not tabs.busy:
+                return
+            done = tabs.poll()
+            for url, ctx, row, timed_out in done:
+                if timed_out:
+                    if on_timeout:
+                        log(f"⏭ タイムアウト→後で再試行: {url}")
+                        on_timeout(url, ctx)
+                        continue
+                    log(f"⏭ タイムアウト→スキップ: {url}")
+                if cache and row and row.get("company_name"):
+                    cache.put(url, row)
+                on_done(url, ctx, row)
+            if done:
+                idle = 0.02
+            elif not getattr(tabs, "waits", False):
+                time.sleep(idle)
+                idle = min(idle * 1.5, 0.25)
+    except Exception as e:
+        log(f"⚠ タブプールで例外: {e}")
+        for url, ctx in tabs.abandon():
+            on_done(url, ctx, None)
+        raise
+    finally:
+        tabs.park()
+
+# ===== DevTools直結バックエンド（--backend cdp） =====
+# 見出しの表示か埋め込みデータの到着をページ内の MutationObserver で待つ（問い合わせの往復で待たない）
+CDP_READY_JS = r"""
+const [sels, embedded, ms] = arguments;
+const vis = el => !!(el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length));
+const embeddedReady = () => {""" + EMBEDDED_READY_JS + r"""};
+const check = () => {
+    const root = document.documentElement;
+    if (!root || root.hasAttribute('data-scraper-stale')) return null;
+    if (embedded && embeddedReady()) return "embedded";
+    for (const css of sels) for (const el of document.querySelectorAll(css)) if (vis(el)) return "heading";
+    return null;
+};
+return new Promise(resolve => {
+    const hit = check();
+    if (hit) return resolve(hit);
+    let timer = null;
+    const obs = new MutationObserver(() => {
+        const h = check();
+        if (h) { obs.disconnect(); clearTimeout(timer); resolve(h); }
+    });
+    obs.observe(document, {childList: true, subtree: true, attributes: true});
+    timer = setTimeout(() => { obs.disconnect(); resolve(check() || "timeout"); }, ms);
+});
+"""
+STALE_MARK_JS = "document.documentElement && document.documentElement.setAttribute('data-scraper-stale', '1');"
+
+class CdpError(RuntimeError):
+    pass
+
+_cdp_loop = None
+_cdp_loop_lock = threading.Lock()
 
+def cdp_loop():
+    """DevTools 接続を動かすイベントループ（全Chrome共通の専用スレッド1本）"""
+    global _cdp_loop
+    with _cdp_loop_lock:
+        if _cdp_loop is None:
+            _cdp_loop = asyncio.new_event_loop()
+            threading.Thread(target=_cdp_loop.run_forever, daemon=True).start()
+    return _cdp_loop
+
+class CdpConnection:
+    """
+    Chrome の DevTools（ブラウザ単位の WebSocket 1本）。各タブ（Target）は flatten セッションで同じ接続に載せ、
+    応答は id で、イベントは (sessionId, method) で待ち手に振り分ける。
+    """
+
+    def __init__(self, ws_url):
+        self.ws_url = ws_url
+        self.ws = None
+        self.next_id = 0
+        self.calls = {}
+        self.waiters = defaultdict(list)
+        self.closed = False
+        self.page = None  # open_and_extract 用に使い回すタブ (target_id, session_id)
+
+    def run(self, coro, timeout=None):
+        """呼び出し元スレッドから coro を実行して結果を待つ"""
+        return asyncio.run_coroutine_threadsafe(coro, cdp_loop()).result(timeout)
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.ws_url, max_size=None, ping_interval=None)
+        asyncio.ensure_future(self._read())
+
+    async def _read(self):
         try:
-            card.click()
-            WebDriverWait(driver, 12).until(EC.any_of(
-                EC.visibility_of_element_located((By.CSS_SELECTOR, 'h1.DUwDvf.lfPIob')),
-                EC.visibility_of_element_located((By.CSS_SELECTOR, 'h1.fontHeadlineLarge')),
-                EC.visibility_of_element_located((By.CSS_SELECTOR, 'h1[aria-level="1"]')),
-                EC.visibility_of_element_located((By.CSS_SELECTOR, 'h1[role="heading"]')),
-            ))
-            cur = driver.current_url
-            if "/maps/place/" in cur: urls.add(cur)
+            async for raw in self.ws:
+                msg = json.loads(raw)
+                if "id" in msg:
+                    fut = self.calls.pop(msg["id"], None)
+                    if fut is None or fut.done():
+                        continue
+                    if "error" in msg:
+                        fut.set_exception(CdpError(msg["error"].get("message", "")))
+                    else:
+                        fut.set_result(msg.get("result") or {})
+                else:
+                    for fut in self.waiters.pop((msg.get("sessionId"), msg.get("method")), ()):
+                        if not fut.done():
+                            fut.set_result(msg.get("params") or {})
         except Exception:
             pass
         finally:
-            with suppress(Exception):
-                driver.back()
-            try:
-                WebDriverWait(driver, 12).until(EC.presence_of_element_located((By.XPATH, '//div[@role="feed"]')))
-                feed = driver.find_element(By.XPATH, '//div[@role="feed"]')
-            except Exception:
-                break
-    return list(urls)
+            self.closed = True
+            pending = list(self.calls.values()) + [f for futs in self.waiters.values() for f in futs]
+            self.calls.clear()
+            self.waiters.clear()
+            for fut in pending:
+                if not fut.done():
+                    fut.set_exception(CdpError("DevTools の接続が切れました"))
 
-def scroll_feed_to_bottom(driver, feed):
-    prev_count = 0
+    async def call(self, method, params=None, session=None):
+        if self.closed:
+            raise CdpError("DevTools の接続が切れています")
+        self.next_id += 1
+        msg = {"id": self.next_id, "method": method, "params": params or {}}
+        if session:
+            msg["sessionId"] = session
+        fut = asyncio.get_running_loop().create_future()
+        self.calls[self.next_id] = fut
+        await self.ws.send(json.dumps(msg))
+        return await fut
+
+    def expect(self, method, session=None):
+        """次に届く method イベントの Future（送信前に作っておけば取りこぼさない）"""
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters[(session, method)].append(fut)
+        return fut
+
+    async def evaluate(self, session, body, args=(), await_promise=False):
+        """execute_script と同じ形（arguments・return）のJSを実行して値を返す"""
+        expr = f"(function(){{\n{body}\n}}).apply(null, {json.dumps(list(args), ensure_ascii=False)})"
+        res = await self.call("Runtime.evaluate", {"expression": expr, "returnByValue": True,
+                                                   "awaitPromise": await_promise}, session)
+        if res.get("exceptionDetails"):
+            raise CdpError(res["exceptionDetails"].get("text", "JS error"))
+        return (res.get("result") or {}).get("value")
+
+    async def open_target(self):
+        target = (await self.call("Target.createTarget", {"url": "about:blank"}))["targetId"]
+        session = (await self.call("Target.attachToTarget", {"targetId": target, "flatten": True}))["sessionId"]
+        await self.call("Page.enable", {}, session)
+        if LEAN_MODE:
+            await self.call("Network.enable", {}, session)
+            await self.call("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS}, session)
+        return target, session
+
+    async def close_target(self, target):
+        await self.call("Target.closeTarget", {"targetId": target})
+
+    async def load(self, session, url, timeout):
+        """
+        タブで url を開いて抽出する。読み込みは Page.domContentEventFired、表示は CDP_READY_JS で待つ。
+        {"row", "ready_s", "extract_s", "source", "timed_out", "stats"} を返す。
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        res = {"row": None, "ready_s": 0.0, "extract_s": 0.0, "source": "dom", "timed_out": False, "stats": {}}
+        remaining = lambda: int((deadline - time.monotonic()) * 1000)
+
+        async def wait_ready(embedded):
+            while remaining() > 0:
+                try:
+                    return await self.evaluate(session, CDP_READY_JS, [NAME_SELECTORS[:4], embedded, remaining()],
+                                               await_promise=True)
+                except CdpError:
+                    if self.closed:
+                        raise
+                    await asyncio.sleep(0.05)  # 遷移で実行コンテキストが入れ替わった → 新しい文書で待ち直す
+            return "timeout"
+
+        with suppress(CdpError):
+            await self.evaluate(session, STALE_MARK_JS)
+        loaded = self.expect("Page.domContentEventFired", session)
+        await self.call("Page.navigate", {"url": url}, session)
+        state = "timeout"
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(loaded, timeout)
+            state = await wait_ready(EMBEDDED_MODE)
+        res["ready_s"] = time.monotonic() - start
+
+        t0 = time.monotonic()
+        if state == "embedded":
+            payloads = await self.evaluate(session, EMBEDDED_STATE_JS)
+            res["row"] = parse_embedded_place(payloads, url) if payloads else None
+            if res["row"]:
+                res["source"] = "embedded"
+            else:
+                state = await wait_ready(False)  # 検証に落ちたら描画を待ってDOMから取る
+        if state == "timeout":
+            res["timed_out"] = True
+            with suppress(CdpError):
+                await self.call("Page.navigate", {"url": "about:blank"}, session)
+            return res
+        if not res["row"]:
+            snap = await self.evaluate(session, PLACE_SNAPSHOT_JS, [PLACE_SNAPSHOT_SELECTORS])
+            res["row"] = parse_place_snapshot(snap) if isinstance(snap, dict) else None
+        res["extract_s"] = time.monotonic() - t0
+        with suppress(CdpError):
+            res["stats"] = await self.evaluate(session, PAGE_STATS_JS) or {}
+        return res
+
+def cdp_for(driver):
+    """driver と同じChromeへの DevTools 接続（初回に接続して driver に持たせる。使えなければ None で Selenium のまま）"""
+    conn = getattr(driver, "cdp_conn", None)
+    if conn is not None and not conn.closed:
+        return conn
+    if getattr(driver, "cdp_failed", False):
+        return None
+    try:
+        if websockets is None:
+            raise CdpError("websockets がインストールされていません（pip3 install websockets）")
+        addr = driver.capabilities["goog:chromeOptions"]["debuggerAddress"]
+        with urlopen(f"http://{addr}/json/version", timeout=5) as resp:
+            ws_url = json.loads(resp.read())["webSocketDebuggerUrl"]
+        conn = CdpConnection(ws_url)
+        conn.run(conn.connect(), 10)
+    except Exception as e:
+        driver.cdp_failed = True
+        log(f"⚠ DevTools に接続できないため Selenium で続行: {e}")
+        return None
+    driver.cdp_conn = conn
+    return conn
+
+def record_cdp_result(driver, url, res):
+    """CdpConnection.load の結果を open_and_extract・TabPool と同じ計測イベントにして、行を返す"""
+    ready_s = res["ready_s"]
+    if res["timed_out"]:
+        metrics.event("detail-open", ready_s, url, "timeout")
+        scheduler.observe_timeout(ready_s)
+        return None
+    if res["source"] == "embedded":
+        metrics.event("detail-open", ready_s, url, source="embedded")
+    else:
+        metrics.event("detail-open", ready_s, url)
+    scheduler.observe(ready_s)
+    metrics.event("extract", res["extract_s"], url, "ok" if res["row"] else "error", source=res["source"])
+    health.observe(driver, ready_s)
+    page_stats.add(res["stats"], ready_s * 1000)
+    return res["row"]
+
+def cdp_open_and_extract(driver, conn, place_url, timeout=None, on_timeout=None):
+    """open_and_extract の DevTools 版（タブ1つを使い回す）"""
+    TIMEOUT = timeout or scheduler.timeout()
+    try:
+        if conn.page is None:
+            conn.page = conn.run(conn.open_target(), 15)
+        res = conn.run(conn.load(conn.page[1], place_url, TIMEOUT), TIMEOUT + 15)
+    except Exception as e:
+        log(f"⏭ 例外スキップ: {place_url} / {e}")
+        metrics.event("detail-open", 0.0, place_url, "error")
+        conn.page = None
+        return None
+    row = record_cdp_result(driver, place_url, res)
+    if res["timed_out"]:
+        if on_timeout:
+            log(f"⏭ タイムアウト({TIMEOUT:.0f}秒)→後で再試行: {place_url}")
+            on_timeout(place_url)
+        else:
+            log(f"⏭ タイムアウト→スキップ: {place_url}")
+    return row
+
+class CdpTabPool:
+    """
+    TabPool と同じ使い方で、DevTools の Target を size 個開いて並行に読み込む。
+    各タブは専用スレッドのイベントループ上で並行に待ち、終わった順に poll() へ渡す。
+    """
+    waits = True  # poll() が完了を待つので run_tab_pipeline は sleep しない
+
+    def __init__(self, driver, conn, size, timeout=None):
+        self.driver = driver
+        self.conn = conn
+        self.timeout = timeout
+        self.targets = []
+        try:
+            for _ in range(size):
+                self.targets.append(conn.run(conn.open_target(), 15))
+        except Exception:
+            self.close()
+            raise
+        self.slots = {}  # target_id -> (url, ctx, 番号)
+        self.finished = queue.Queue()
+        self.seq = 0
+
+    @property
+    def free(self):
+        return [t for t in self.targets if t[0] not in self.slots]
+
+    @property
+    def busy(self):
+        return len(self.slots)
+
+    def park(self):
+        pass  # Seleniumのウィンドウは切り替えていない
+
+    def submit(self, url, ctx=None):
+        target, session = self.free[0]
+        self.seq += 1
+        seq = self.seq
+        self.slots[target] = (url, ctx, seq)
+        fut = asyncio.run_coroutine_threadsafe(
+            self.conn.load(session, url, self.timeout or scheduler.timeout()), cdp_loop())
+        fut.add_done_callback(lambda f: self.finished.put((target, seq, f)))
+
+    def poll(self):
+        """終わったタブを [(url, ctx, row, タイムアウトか)] で返す（無ければ少しだけ完了を待つ）"""
+        items = []
+        with suppress(queue.Empty):
+            items.append(self.finished.get(timeout=0.25))
+            while True:
+                items.append(self.finished.get_nowait())
+        done = []
+        for target, seq, fut in items:
+            slot = self.slots.get(target)
+            if not slot or slot[2] != seq:
+                continue  # abandon 済み
+            del self.slots[target]
+            url, ctx, _ = slot
+            try:
+                res = fut.result()
+            except Exception as e:
+                log(f"  ✖ DevTools 抽出エラー: {url} / {e}")
+                metrics.event("detail-open", 0.0, url, "error")
+                done.append((url, ctx, None, False))
+                continue
+            done.append((url, ctx, record_cdp_result(self.driver, url, res), res["timed_out"]))
+        return done
+
+    def abandon(self):
+        pending = [(url, ctx) for url, ctx, _ in self.slots.values()]
+        self.slots.clear()
+        return pending
+
+    def close(self):
+        for target, _ in self.targets:
+            with suppress(Exception):
+                self.conn.run(self.conn.close_target(target), 5)
+
+def open_tab_pool(driver, size):
+    """--backend cdp なら DevTools 直結のタブプール、使えなければ従来の TabPool"""
+    if BACKEND == "cdp":
+        conn = cdp_for(driver)
+        if conn:
+            return CdpTabPool(driver, conn, size)
+    return TabPool(driver, size)
+
+# ===== 一覧：スクロール・URL収集・クリック補完 =====
+FEED_HARVEST_JS = r"""
+const feed = arguments[0];
+const txt = el => ((el && el.innerText) || "").trim();
+const cards = [];
+document.querySelectorAll('div.Nv2PK').forEach((card, i) => {
+    const a = card.querySelector('a.hfpxzc') || card.querySelector('a[href*="/maps/place/"]');
+    const star = card.querySelector('span[role="img"][aria-label]');
+    cards.push({
+        index: i,
+        href: a ? (a.href || "") : "",
+        name: (a && a.getAttribute('aria-label')) || txt(card.querySelector('.qBF1Pd')),
+        rating: txt(card.querySelector('span.MW4etd')),
+        reviews: txt(card.querySelector('span.UY7F9')),
+        star_label: star ? star.getAttribute('aria-label') : "",
+        lines: Array.from(card.querySelectorAll('.W4Efsd')).map(txt).filter(Boolean),
+    });
+});
+const extra = [];
+if (feed) feed.querySelectorAll('a[href*="/maps/place/"]').forEach(a => extra.push(a.href));
+return {cards: cards, extra: extra};
+"""
+
+def _to_number(s, cast=float):
+    s = re.sub(r"[^\d\.]", "", s or "")
+    if not s: return None
+    try: return cast(float(s))
+    except ValueError: return None
+
+def parse_feed_card(raw):
+    """FEED_HARVEST_JS のカード1件を一覧メタデータに整形する"""
+    rating = _to_number(raw.get("rating"))
+    reviews = _to_number(raw.get("reviews"), int)
+    label = raw.get("star_label") or ""
+    if reviews is None:
+        m = re.search(r"(\d[\d,]*)\s*件", label) or REVIEWS_RE.search(label)
+        if m: reviews = _to_number(m.group(1), int)
+    category = ""
+    for line in raw.get("lines") or []:
+        parts = [p.strip() for p in re.split(r"[·・]", line) if p.strip()]
+        # 評価行（"4.5(12)"）や住所・営業時間行を避け、先頭セグメントが短いものをカテゴリとみなす
+        if parts and not re.match(r"^[\d\.\(\),\s]+$", parts[0]) and len(parts[0]) <= 30:
+            category = parts[0]; break
+    return {
+        "url": raw.get("href") or "",
+        "name": (raw.get("name") or "").strip(),
+        "rating": rating,
+        "review_count": reviews or 0,
+        "category": category,
+    }
+
+def harvest_feed_cards(driver, feed):
+    """一覧の全カードのメタデータを execute_script 1回で取得する（(cards, extra_hrefs)）"""
+    try:
+        res = driver.execute_script(FEED_HARVEST_JS, feed) or {}
+    except Exception:
+        return [], []
+    cards = []
+    for raw in res.get("cards") or []:
+        card = parse_feed_card(raw)
+        card["index"] = raw.get("index")
+        cards.append(card)
+    return cards, [h for h in res.get("extra") or [] if h]
+
+def _click_card_for_url(driver, index):
+    """リンクを持たないカードをクリックして詳細URLを得る（取得後は一覧へ戻る）"""
+    url = ""
+    try:
+        card = driver.execute_script("return document.querySelectorAll('div.Nv2PK')[arguments[0]] || null;", index)
+        if not card: return ""
+        driver.execute_script("arguments[0].scrollIntoView({block:'center'});", card)
+        card.click()
+        WebDriverWait(driver, 12).until(EC.any_of(
+            EC.visibility_of_element_located((By.CSS_SELECTOR, 'h1.DUwDvf.lfPIob')),
+            EC.visibility_of_element_located((By.CSS_SELECTOR, 'h1.fontHeadlineLarge')),
+            EC.visibility_of_element_located((By.CSS_SELECTOR, 'h1[aria-level="1"]')),
+            EC.visibility_of_element_located((By.CSS_SELECTOR, 'h1[role="heading"]')),
+        ))
+        cur = driver.current_url
+        if "/maps/place/" in cur: url = cur
+    except Exception:
+        pass
+    finally:
+        with suppress(Exception):
+            driver.back()
+        with suppress(Exception):
+            WebDriverWait(driver, 12).until(EC.presence_of_element_located((By.XPATH, '//div[@role="feed"]')))
+    return url
+
+def collect_feed_listings(driver, feed, expect_min=0):
+    """
+    一覧からプレイスURLと一覧レベルのメタデータ（名前・評価・クチコミ数・カテゴリ）を集める。
+    リンクのあるカードは1回のスクリプト呼び出しでまとめて取得し、
+    リンクのないカードだけを最後にまとめてクリック補完する。
+    戻り値: {url: メタデータ dict}
+    """
+    cards, extra = harvest_feed_cards(driver, feed)
+    listings = {}
+    linkless = []
+    for card in cards:
+        if "/maps/place/" in card["url"]:
+            listings.setdefault(card["url"], card)
+        else:
+            linkless.append(card)
+    for href in extra:
+        if "/maps/place/" in href and href not in listings:
+            listings[href] = {"url": href, "name": "", "rating": None, "review_count": 0, "category": ""}
+
+    for card in linkless:
+        if expect_min and len(listings) >= expect_min: break
+        url = _click_card_for_url(driver, card["index"])
+        if url:
+            card["url"] = url
+            listings.setdefault(url, card)
+    return listings
+
+def collect_place_urls_from_feed(driver, feed, expect_min=0):
+    return list(collect_feed_listings(driver, feed, expect_min))
+
+# ===== 待機（イベント駆動） =====
+FEED_GROWTH_JS = r"""
+const feed = arguments[0], prev = arguments[1], timeoutMs = arguments[2];
+const done = arguments[arguments.length - 1];
+const count = () => document.querySelectorAll('div.Nv2PK').length;
+const ended = () => {
+    if (feed.querySelector('span.HlvSq')) return true;
+    const last = feed.lastElementChild;
+    const t = (last && last.innerText) || "";
+    return /リストの最後に到達しました|reached the end of the list/i.test(t);
+};
+const state = () => ({count: count(), ended: ended()});
+const first = state();
+if (first.count > prev || first.ended) { done(first); return; }
+let timer = null;
+const obs = new MutationObserver(() => {
+    const s = state();
+    if (s.count > prev || s.ended) { obs.disconnect(); clearTimeout(timer); done(s); }
+});
+obs.observe(feed, {childList: true, subtree: true});
+timer = setTimeout(() => { obs.disconnect(); done(state()); }, timeoutMs);
+"""
+
+def wait_for_feed_growth(driver, feed, prev_count, timeout):
+    """
+    カード数が prev_count を超えるか、リスト末尾の表示が出るまで待つ。
+    MutationObserverで検知するので、変化があれば timeout を待たずに返る。
+    戻り値: (カード数, 末尾到達か)
+    """
+    try:
+        res = driver.execute_async_script(FEED_GROWTH_JS, feed, prev_count, int(timeout * 1000))
+        return int(res.get("count") or 0), bool(res.get("ended"))
+    except Exception:
+        time.sleep(timeout)
+        with suppress(Exception):
+            return len(driver.find_elements(By.CSS_SELECTOR, 'div.Nv2PK')), False
+        return prev_count, False
+
+def scroll_feed_to_bottom(driver, feed, max_rounds=80, base_wait=0.4, max_wait=3.0, max_stagnate=4):
+    """
+    フィードを末尾までスクロールしてカード数を返す。
+    新しいカードが出れば即座に次のスクロールへ進み、出ない間だけ待ち時間を伸ばす（バックオフ）。
+    """
+    prev_count = 0
     stagnate = 0
-    for _ in range(80):
+    wait = base_wait
+    with suppress(Exception):
+        driver.set_script_timeout(max_wait + 5)
+    for _ in range(max_rounds):
         driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", feed)
-        time.sleep(1.4)
-        cards = driver.find_elements(By.CSS_SELECTOR, 'div.Nv2PK')
-        if len(cards) == prev_count:
-            stagnate += 1
-        else:
+        count, ended = wait_for_feed_growth(driver, feed, prev_count, wait)
+        if count > prev_count:
+            prev_count = count
             stagnate = 0
-            prev_count = len(cards)
-        if stagnate >= 5: break
+            wait = base_wait
+        else:
+            stagnate += 1
+            wait = min(wait * 1.6, max_wait)
+        if ended or stagnate >= max_stagnate: break
     return prev_count
 
 def click_next_page_if_exists(driver):
@@ -510,110 +2025,2044 @@ def click_next_page_if_exists(driver):
         (By.XPATH, '//a[contains(text(),"次へ") or contains(text(),"Next")]'),
         (By.XPATH, '//button[contains(text(),"さらに表示") or contains(text(),"他の結果") or contains(text(),"More results")]'),
     ]
+    card_css = 'div[role="feed"] div.Nv2PK'
     for by, sel in candidates:
         try:
             btn = driver.find_element(by, sel)
             if not btn.is_enabled(): continue
+            # 押す前の先頭カードを覚えておく（押した直後は前ページのカードが残っているので、入れ替わるまで待つ）
+            old_cards = driver.find_elements(By.CSS_SELECTOR, card_css)
+            old_first = old_cards[0] if old_cards else None
             driver.execute_script("arguments[0].scrollIntoView({block:'center'});", btn)
-            time.sleep(0.2)
             btn.click()
-            WebDriverWait(driver, 12).until(EC.presence_of_element_located((By.XPATH, '//div[@role="feed"]')))
-            time.sleep(0.8)
-            return True
         except Exception:
             continue
+
+        def _switched(d):
+            cards = d.find_elements(By.CSS_SELECTOR, card_css)
+            if old_first is None:
+                return bool(cards)  # 押す前に一覧が無かった → カードが出たら切り替わったとみなす
+            # 先頭カードが消えた・カード数が変わったら切り替わった（新しい一覧が一瞬空でも待ち続けない）
+            return EC.staleness_of(old_first)(d) or len(cards) != len(old_cards)
+
+        try:
+            WebDriverWait(driver, 12, poll_frequency=0.1).until(_switched)
+            return True
+        except TimeoutException:
+            log("⚠ 次ページに切り替わらないため打ち切り")
+            return False
     return False
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Googleマップスクレイパー")
-    parser.add_argument("--keyword", required=True, help="検索キーワード（例: リノベーション業者）")
-    parser.add_argument("--cities", required=True, help="エリアリスト（JSON配列）")
-    parser.add_argument("--max-pages", type=int, default=5, help="最大ページ数")
-    parser.add_argument("--headless", action="store_true", help="ヘッドレスモードで実行")
-    args = parser.parse_args()
+# ===== エリア検索（検索→スクロール→URL収集→次ページ） =====
+def search_and_collect(driver, query, max_pages, label="", cancel=None, skipped=None, search_url=None):
+    """
+    検索語で一覧を開き、全ページのプレイスURLと一覧メタデータを集める（search_url 指定時はそのURLを開く）。
+    戻り値: {url: 一覧メタデータ}（詳細を開く前の絞り込みに使える）
+    同じプレイス（place_key）がページをまたいで出た分は除き、skipped["page"] に数える。
+    cancel（threading.Event）がセットされたらページ送りを打ち切る。
+    """
+    search_url = search_url or f"{MAPS_BASE_URL}/maps/search/?api=1&query={quote_plus(query)}&hl=ja"
+    with metrics.phase("search", search_url):
+        driver.get(search_url)
+    with metrics.phase("consent") as ev:
+        clicked = False
+        with suppress(Exception):
+            clicked = handle_google_consent(driver, timeout=8)
+        ev["outcome"] = "clicked" if clicked else "none"
 
-    cities = json.loads(args.cities)
-    keyword_suffix = f"　{args.keyword}"
+    all_urls = {}
+    seen = set()
+    dups = 0
+    scroll_s = 0.0
+    page = 1
+    while page <= max_pages:
+        with metrics.phase("search", page=page) as ev:
+            try:
+                feed = WebDriverWait(driver, 8).until(
+                    EC.presence_of_element_located((By.XPATH, '//div[@role="feed"]'))
+                )
+            except TimeoutException:
+                ev["outcome"] = "timeout"
+                feed = None
+        if feed is None:
+            break
 
-    log(f"🚀 スクレイピング開始: キーワード={args.keyword}, エリア数={len(cities)}")
+        t0 = time.monotonic()
+        with metrics.phase("scroll", page=page) as ev:
+            cards = scroll_feed_to_bottom(driver, feed)
+            ev["cards"] = cards
+        scroll_s += time.monotonic() - t0
+        log(f"📦 ページ{page} カード数: {cards}")
 
-    # Chrome起動
+        with metrics.phase("url-collect", page=page) as ev:
+            listings = collect_feed_listings(driver, feed, expect_min=cards)
+            ev["urls"] = len(listings)
+        for u, meta in listings.items():
+            key = place_key(u)
+            if key in seen:
+                dups += 1
+                continue
+            seen.add(key)
+            all_urls[u] = meta
+        log(f"🔗 ページ{page}: URL {len(listings)}件 / 累計 {len(all_urls)}件")
+
+        with metrics.phase("next-page", page=page) as ev:
+            moved = click_next_page_if_exists(driver)
+            ev["outcome"] = "ok" if moved else "none"
+        if not moved or (cancel and cancel.is_set()):
+            break
+        page += 1
+    if dups:
+        log(f"🧩 ページ間の重複 {dups}件を除外")
+        if skipped is not None:
+            skipped["page"] += dups
+    log(f"⏱ {label or query}: スクロール合計 {scroll_s:.1f}秒")
+    return all_urls
+
+
+# ===== 格子検索（--grid） =====
+def parse_grid_areas(spec):
+    """
+    --grid のJSONを [{"name", "bbox": (南, 西, 北, 東), "polygon": [(lat, lng), ...] or None}] にする。
+    1件は {"name": "奈良市", "bbox": [南, 西, 北, 東]} か {"name": ..., "polygon": [[lat, lng], ...]}（配列で複数可）。
+    """
+    items = spec if isinstance(spec, list) and spec and isinstance(spec[0], dict) else [spec]
+    areas = []
+    for i, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            item = {"bbox": item}
+        polygon = [(float(lat), float(lng)) for lat, lng in item.get("polygon") or []]
+        if polygon:
+            lats, lngs = [p[0] for p in polygon], [p[1] for p in polygon]
+            bbox = (min(lats), min(lngs), max(lats), max(lngs))
+        else:
+            south, west, north, east = (float(x) for x in item["bbox"])
+            bbox = (min(south, north), min(west, east), max(south, north), max(west, east))
+        areas.append({"name": item.get("name") or f"grid{i}", "bbox": bbox, "polygon": polygon or None})
+    return areas
+
+def point_in_polygon(lat, lng, polygon):
+    inside = False
+    for (y1, x1), (y2, x2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (y1 > lat) != (y2 > lat) and lng < (x2 - x1) * (lat - y1) / (y2 - y1) + x1:
+            inside = not inside
+    return inside
+
+def cell_touches_polygon(cell, polygon):
+    """セル（南, 西, 北, 東）が多角形にかかるか（角・中心が内側か、頂点がセル内なら重なりとみなす概算）"""
+    south, west, north, east = cell
+    pts = [(south, west), (south, east), (north, west), (north, east), ((south + north) / 2, (west + east) / 2)]
+    if any(point_in_polygon(lat, lng, polygon) for lat, lng in pts):
+        return True
+    return any(south <= lat <= north and west <= lng <= east for lat, lng in polygon)
+
+def zoom_for_cell(cell, view_tiles=4):
+    """セル全体が画面（256px×view_tiles 程度）に収まるズーム"""
+    south, west, north, east = cell
+    span = max(east - west, (north - south) / max(0.2, math.cos(math.radians((south + north) / 2))), 1e-6)
+    return max(10, min(18, int(math.log2(360 * view_tiles / span))))
+
+def grid_search_url(keyword, cell):
+    south, west, north, east = cell
+    return (f"{MAPS_BASE_URL}/maps/search/{quote(keyword)}/"
+            f"@{(south + north) / 2:.6f},{(west + east) / 2:.6f},{zoom_for_cell(cell)}z?hl=ja")
+
+def grid_sweep(driver, area, keyword, cancel=None, skipped=None, seen_coords=None,
+               full=GRID_FULL_RESULTS, max_depth=GRID_MAX_DEPTH):
+    """
+    範囲を4分木で区切って表示範囲検索（/@lat,lng,zoom）を行い、セルごとに {url: 一覧メタデータ} を yield する。
+    - 一覧が full 件以上のセルは取りこぼしがあるとみなして4分割（max_depth まで）
+    - 範囲内の結果が0件のセルはそこで打ち切り、多角形の外側にかかるセルは検索しない
+    - 座標（parse_coords_from_url）が範囲外の結果は除き、同じ座標の重複は seen_coords で除く
+    """
+    polygon = area["polygon"]
+    seen_coords = set() if seen_coords is None else seen_coords
+    cells = deque([(area["bbox"], 0)])
+    while cells:
+        if cancel and cancel.is_set():
+            return
+        cell, depth = cells.popleft()
+        if polygon and not cell_touches_polygon(cell, polygon):
+            continue
+        south, west, north, east = cell
+        listings = search_and_collect(driver, f"{area['name']}　{keyword}", 1, area["name"], cancel, skipped,
+                                      search_url=grid_search_url(keyword, cell))
+        found, dups = {}, 0
+        for u, meta in listings.items():
+            latlon = parse_coords_from_url(u)
+            if latlon:
+                lat, lng = latlon
+                if not (south <= lat <= north and west <= lng <= east):
+                    continue
+                if polygon and not point_in_polygon(lat, lng, polygon):
+                    continue
+                key = (round(lat, 5), round(lng, 5))
+                if key in seen_coords:
+                    dups += 1
+                    continue
+                seen_coords.add(key)
+            found[u] = meta
+        if dups and skipped is not None:
+            skipped["coord"] += dups
+
+        split = len(listings) >= full and depth < max_depth
+        note = " → 4分割" if split else (" → 打ち切り" if not found else "")
+        log(f"🗺 セル{depth}段 ({south:.4f},{west:.4f})-({north:.4f},{east:.4f}) z{zoom_for_cell(cell)}: "
+            f"{len(listings)}件中 範囲内 {len(found)}件{note}")
+        if split:
+            mid_lat, mid_lng = (south + north) / 2, (west + east) / 2
+            for child in ((south, west, mid_lat, mid_lng), (south, mid_lng, mid_lat, east),
+                          (mid_lat, west, north, mid_lng), (mid_lat, mid_lng, north, east)):
+                cells.append((child, depth + 1))
+        if found:
+            yield found
+
+# ===== 読み込みタイムアウトの調整・再試行 =====
+class LoadScheduler:
+    """
+    プレイスページの読み込み時間の分布からタイムアウトを決める。
+    - 観測が min_samples 件たまるまでは CARD_LOAD_TIMEOUT のまま
+    - 以降は直近 window 件の p99 × factor（floor〜CARD_LOAD_TIMEOUT の範囲）
+    - タイムアウトした読み込みも ceiling で頭打ちにした観測値として入れる（成功だけだと短く見積もりすぎる）
+    タイムアウトしたURLは呼び出し側で後回しにし、retry_timeout（ceiling × retry_factor）で再試行する。
+    """
+
+    def __init__(self, factor=2.0, floor=8.0, ceiling=CARD_LOAD_TIMEOUT, min_samples=20, window=300, retry_factor=2.0):
+        self.adaptive = True
+        self.factor = factor
+        self.retry_factor = retry_factor
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_samples = min_samples
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+        self.retried = 0
+        self.recovered = 0
+
+    @property
+    def retry_timeout(self):
+        return self.ceiling * self.retry_factor
+
+    def timeout(self):
+        with self.lock:
+            if not self.adaptive or len(self.samples) < self.min_samples:
+                return self.ceiling
+            p99 = _percentile(sorted(self.samples), 0.99)
+        return max(self.floor, min(self.ceiling, p99 * self.factor))
+
+    def observe(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def observe_timeout(self, seconds):
+        """タイムアウトした読み込み（待った時間を ceiling で頭打ちにして入れる）"""
+        self.observe(min(seconds, self.ceiling))
+
+    def record_retry(self, recovered):
+        with self.lock:
+            self.retried += 1
+            if recovered: self.recovered += 1
+
+    def summary(self):
+        mode = "固定" if not self.adaptive else "適応"
+        return f"🔁 再試行: {self.retried}件 / 回復 {self.recovered}件（タイムアウト{mode} 最終 {self.timeout():.1f}秒）"
+
+scheduler = LoadScheduler()
+
+def retry_place(driver, place_url, cache=None):
+    """後回しにしたURLを新しいタブ・長めのタイムアウトで1件再試行する"""
+    row = extract_place(driver, place_url, cache, timeout=scheduler.retry_timeout)
+    scheduler.record_retry(bool(row and row.get("company_name")))
+    return row
+
+# ===== ブラウザの健全性・再起動 =====
+def browser_rss_mb(driver):
+    """chromedriver配下のプロセスツリー（Chrome本体・レンダラ等）のRSS合計（MB）。psutil が無ければ None"""
+    if psutil is None: return None
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        procs = [root] + root.children(recursive=True)
+    except Exception:
+        return None
+    total = 0
+    for p in procs:
+        with suppress(Exception):
+            total += p.memory_info().rss
+    return total / (1024 * 1024)
+
+class BrowserLost(RuntimeError):
+    """再起動のために閉じたChromeを起動し直せなかった（--profile-dir 時。続けても抽出はすべて失敗する）"""
+
+RELAUNCH_ATTEMPTS = 3  # --profile-dir で古いChromeを閉じた後の起動の試行回数
+
+class BrowserHealth:
+    """
+    Chromeごとのメモリと詳細ページの読み込み時間を見て、再起動が必要かを判定する。
+    - rss_mb        : プロセスツリーのRSS合計の上限（0で無効・psutil が無ければ見ない）
+    - latency_factor: 直近 window 件の読み込み時間の中央値が、起動直後 window 件の何倍を超えたら劣化とみなすか
+    - every         : 1つのChromeで開く最大件数（0で無効）
+    エリアの切れ目では soft=True（しきい値の8割）で判定し、なるべく処理の合間に再起動させる。
+    """
+
+    def __init__(self, rss_mb=0, latency_factor=0, every=0, window=20, rss_interval=10.0):
+        self.rss_mb = rss_mb
+        self.latency_factor = latency_factor
+        self.every = every
+        self.window = window
+        self.rss_interval = rss_interval
+        self.headless = True
+        self.lean = False
+        self.lock = threading.Lock()
+        self.state = weakref.WeakKeyDictionary()  # driver -> 観測値（終了したdriverの分は自動で消える）
+        self.recycled = 0
+
+    def _state(self, driver):
+        return self.state.setdefault(driver, {
+            "baseline": [], "recent": deque(maxlen=self.window), "places": 0, "rss": None, "rss_at": 0.0,
+        })
+
+    def observe(self, driver, seconds):
+        with self.lock:
+            st = self._state(driver)
+            st["places"] += 1
+            if len(st["baseline"]) < self.window:
+                st["baseline"].append(seconds)
+            else:
+                st["recent"].append(seconds)
+
+    def check(self, driver, soft=False):
+        """再起動すべきなら理由の文字列を、不要なら None を返す"""
+        scale = 0.8 if soft else 1.0
+        with self.lock:
+            st = self._state(driver)
+            places = st["places"]
+            baseline = sorted(st["baseline"])
+            recent = sorted(st["recent"])
+        if self.every and places >= self.every * scale:
+            return f"処理件数 {places}件"
+        if self.latency_factor and len(baseline) >= self.window and len(recent) >= self.window // 2:
+            base = _percentile(baseline, 0.5)
+            cur = _percentile(recent, 0.5)
+            if cur > max(base * self.latency_factor * scale, 3.0):
+                return f"読み込み時間 中央値 {cur:.1f}秒（起動直後 {base:.1f}秒）"
+        if self.rss_mb and psutil is not None:
+            # 計測の順番取り・結果の書き込み・読み出しはロック内で行う（プロセスツリーの計測自体は重いのでロック外）
+            with self.lock:
+                now = time.monotonic()
+                due = now - st["rss_at"] >= self.rss_interval
+                if due:
+                    st["rss_at"] = now  # 他のスレッドが同時に計測しないよう先に時刻を進める
+            if due:
+                rss = browser_rss_mb(driver)
+                with self.lock:
+                    st["rss"] = rss
+            with self.lock:
+                rss = st["rss"]
+            if rss and rss > self.rss_mb * scale:
+                return f"RSS {rss:.0f}MB（上限 {self.rss_mb}MB）"
+        return None
+
+    def recycle(self, driver, reason, label=""):
+        """
+        新しいChromeを起動して同意画面まで済ませ、古い方を終了する。
+        起動に失敗したら None（古いChromeで続行し、観測値はリセットして直後の再試行を避ける）。
+        --profile-dir 時は古い方を先に閉じるので続行できない。RELAUNCH_ATTEMPTS 回まで起動し直し、
+        それでも駄目なら BrowserLost を投げて実行を打ち切る。
+        """
+        t0 = time.monotonic()
+        log(f"♻ {label}Chromeを再起動します（{reason}）")
+        with self.lock:
+            self.state.pop(driver, None)
+        _NO_CONSENT_SEEN.discard(driver)
+        slot = getattr(driver, "profile_slot", "main")
+        attempts = 1
+        if PROFILE_DIR:
+            # プロファイルは同時に1つのChromeしか開けないので先に閉じる
+            with suppress(Exception):
+                driver.quit()
+            attempts = RELAUNCH_ATTEMPTS
+        for attempt in range(1, attempts + 1):
+            try:
+                fresh = launch_chrome(self.headless, self.lean, slot)
+                break
+            except Exception as e:
+                error = e
+                if attempt < attempts:
+                    log(f"⚠ {label}Chromeの起動に失敗（{attempt}/{attempts}回目）。再試行します: {e}")
+                    time.sleep(2 * attempt)  # プロファイルのロックが外れるのを待つ
+        else:
+            metrics.event("recycle", time.monotonic() - t0, outcome="error", reason=reason)
+            if PROFILE_DIR:
+                raise BrowserLost(f"{label}Chromeを再起動できません: {error}")
+            log(f"⚠ {label}Chromeの再起動に失敗したため続行します: {error}")
+            return None
+        with suppress(Exception):
+            driver.quit()
+        with suppress(Exception):
+            open_maps_home(fresh)
+        with self.lock:
+            self.recycled += 1
+        metrics.event("recycle", time.monotonic() - t0, reason=reason)
+        return fresh
+
+    def summary(self):
+        return f"♻ ブラウザ再起動: {self.recycled}回"
+
+health = BrowserHealth()
+
+HEALTH_CHECK_EVERY = 25  # タブプール処理中にChromeの状態を確認する間隔（件）
+
+def extract_urls_inline(driver, urls, on_row, cache=None, tab_pool=None, cancel=None, recycle=None):
+    """
+    メインのdriverでURLを順に抽出し、取得できた行ごとに on_row(url, row) を呼ぶ。
+    tab_pool があれば読み込みを重ねて処理する。タイムアウトしたURLは最後にまとめて再試行する。
+    cancel がセットされたら未着手のURLは開かずに終える。
+    recycle(reason) -> (driver, tab_pool) を渡すと、health のしきい値を超えたところで
+    Chromeを入れ替えて残りのURLから再開する。
+    """
+    deferred = []
+    cancelled = lambda: bool(cancel and cancel.is_set())
+
+    def deliver(u, row):
+        if row and row.get("company_name"):
+            on_row(u, row)
+
+    pending = deque(urls)
+    idx = 0
+    while pending and not cancelled():
+        if tab_pool:
+            chunk = iter([pending.popleft() for _ in range(min(len(pending), HEALTH_CHECK_EVERY))])
+
+            def next_task(block):
+                u = None if cancelled() else next(chunk, None)
+                return (u, None) if u else None
+
+            try:
+                run_tab_pipeline(tab_pool, next_task, lambda u, _ctx, row: deliver(u, row), cache,
+                                 on_timeout=lambda u, _ctx: deferred.append(u))
+            except Exception as e:
+                log(f"  ✖ タブプール処理エラー: {e}")
+        else:
+            u = pending.popleft()
+            idx += 1
+            try:
+                deliver(u, extract_place(driver, u, cache, on_timeout=deferred.append))
+            except Exception as e:
+                log(f"  ✖ {idx}件目でエラー: {e}")
+        if recycle and pending:
+            reason = health.check(driver)
+            if reason:
+                driver, tab_pool = recycle(reason)
+
+    if cancelled():
+        return
+    if deferred:
+        log(f"🔁 タイムアウトした {len(deferred)} 件を再試行")
+    for u in deferred:
+        try:
+            deliver(u, retry_place(driver, u, cache))
+        except Exception as e:
+            log(f"  ✖ 再試行エラー: {u} / {e}")
+
+# ===== SQLite出力（--sqlite） =====
+def normalize_company_name(name):
+    """重複判定用の店名: NFKC・小文字化し、法人格（株式会社・(株) など）と空白・記号を除く"""
+    s = unicodedata.normalize("NFKC", name or "").lower()
+    s = COMPANY_FORM_RE.sub("", s)
+    return NAME_NOISE_RE.sub("", s)
+
+def phone_digits(phone):
+    return re.sub(r"\D", "", unicodedata.normalize("NFKC", phone or ""))
+
+def lead_dedupe_key(name, phone, maps_url):
+    """
+    leads.dedupe_key の値。プレイスを特定できるURLなら place_key（cid:/mid:/pid:…）、
+    できなければ "np:<正規化した店名>|<電話番号の数字>"。店名が空なら ""（判定しない）。
+    """
+    key = place_key(maps_url)
+    if key and not key.startswith("url:"):
+        return key
+    norm = normalize_company_name(name)
+    return f"np:{norm}|{phone_digits(phone)}" if norm else ""
+
+class SinkError(RuntimeError):
+    """--sqlite の保存先を開けない（パス不正・leads テーブルが無いなど）"""
+
+class SqliteSink:
+    """
+    抽出した行をアプリのDB（leads テーブル）へ直接書き込む。
+    add() でためて batch_size 件ごとに1トランザクションで INSERT する。
+    重複は dedupe_key のユニークインデックスと、従来の「店名＋電話番号」一致（インデックス付き）で弾く。
+    テーブル・列・インデックスはアプリ側（src/lib/db.ts の migrateDb）が作る。足りなければ変更せずエラーにする。
+    """
+
+    COLUMNS = ("company_name", "industry", "area", "phone", "website_url", "google_maps_url",
+               "category", "postal_code", "address", "sns_urls", "review_count", "latitude", "longitude",
+               "prefecture", "city", "site_status", "site_final_url")
+    REQUIRED_INDEXES = ("idx_leads_dedupe_key", "idx_leads_name_phone")  # 重複判定に使う（migrateDb が作る）
+
+    def __init__(self, path, batch_size=SQLITE_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.pending = []
+        self.added = 0
+        self.skipped = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA busy_timeout=10000")  # アプリ側の書き込みと競合したら待つ
+        cols = {r[1] for r in self.conn.execute("PRAGMA table_info(leads)")}
+        if not cols:
+            self.conn.close()
+            raise RuntimeError(f"{path} に leads テーブルがありません（先にアプリを起動してDBを初期化してください）")
+        indexes = {r[1] for r in self.conn.execute("PRAGMA index_list(leads)")}
+        missing = [c for c in self.COLUMNS + ("source", "dedupe_key") if c not in cols]
+        missing += [i for i in self.REQUIRED_INDEXES if i not in indexes]
+        if missing:
+            self.conn.close()
+            raise RuntimeError(f"{path} の leads に {', '.join(missing)} がありません"
+                               "（アプリを最新版で起動してDBを移行してください）")
+        self.collisions = 0
+        self.backfilled = self._backfill()
+        self.insert_sql = (
+            f"INSERT OR IGNORE INTO leads ({', '.join(self.COLUMNS)}, source, dedupe_key) "
+            f"SELECT {', '.join('?' * len(self.COLUMNS))}, 'google_maps', ? "
+            "WHERE NOT EXISTS (SELECT 1 FROM leads WHERE company_name = ? AND phone = ?)"
+        )
+
+    def _backfill(self, chunk=5000, show=10):
+        """
+        dedupe_key が未設定の既存行（手入力・旧バージョンの取り込み）にキーを付ける。
+        別の行と同じキーになった行（既存leadどうしの重複）は '' にして、どの行と重なったかをログに出す。
+        """
+        done = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, company_name, phone, google_maps_url FROM leads WHERE dedupe_key IS NULL LIMIT ?",
+                (chunk,),
+            ).fetchall()
+            if not rows:
+                if self.collisions > show:
+                    log(f"⚠ 既存leadの重複 ほか {self.collisions - show}件")
+                return done
+            keys = {lid: lead_dedupe_key(name, phone, url) for lid, name, phone, url in rows}
+            self.conn.execute("BEGIN")
+            self.conn.executemany("UPDATE OR IGNORE leads SET dedupe_key = ? WHERE id = ?",
+                                  [(key, lid) for lid, key in keys.items()])
+            clashed = [(lid, name, phone) for lid, name, phone, _ in rows
+                       if self.conn.execute("SELECT dedupe_key IS NULL FROM leads WHERE id = ?", (lid,)).fetchone()[0]]
+            for lid, name, phone in clashed:
+                self.collisions += 1
+                if self.collisions <= show:
+                    holder = self.conn.execute("SELECT id FROM leads WHERE dedupe_key = ?", (keys[lid],)).fetchone()
+                    log(f"⚠ 既存leadの重複: #{lid} {name} / {phone or '電話なし'} は #{holder[0] if holder else '?'} と同じ"
+                        "（重複判定キーを付けずに残します）")
+            self.conn.executemany("UPDATE leads SET dedupe_key = '' WHERE id = ?", [(lid,) for lid, *_ in clashed])
+            self.conn.execute("COMMIT")
+            done += len(rows)
+
+    def known_places(self):
+        """leads に登録済みのプレイスを known_index の形（{place_key: google_maps_url}）で返す"""
+        with self.lock:
+            cur = self.conn.execute("SELECT google_maps_url FROM leads WHERE google_maps_url != ''")
+            return known_index(url for url, in cur)
+
+    def add(self, row):
+        """1件ためる。batch_size に達したら True（呼び出し側で flush する）"""
+        with self.lock:
+            self.pending.append(row)
+            return len(self.pending) >= self.batch_size
+
+    def flush(self):
+        """ためた行を1トランザクションで書き込み、(追加件数, スキップ件数, 分析対象サイトがある新規lead id) を返す"""
+        with self.lock:
+            rows, self.pending = self.pending, []
+            if not rows:
+                return 0, 0, []
+            added, skipped, lead_ids = 0, 0, []
+            self.conn.execute("BEGIN")
+            try:
+                for r in rows:
+                    name = (r.get("company_name") or "").strip()
+                    phone = r.get("phone") or ""
+                    if not name:
+                        skipped += 1
+                        continue
+                    values = (name, r.get("industry") or "", r.get("area") or "", phone,
+                              r.get("website_url") or "", r.get("google_maps_url") or "",
+                              r.get("category") or "", r.get("postal_code") or "", r.get("address") or "",
+                              r.get("sns_urls") or "", r.get("review_count") or 0,
+                              r.get("latitude"), r.get("longitude"),
+                              r.get("prefecture") or "", r.get("city") or "",
+                              r.get("site_status"), r.get("site_final_url") or "")
+                    key = lead_dedupe_key(name, phone, r.get("google_maps_url"))
+                    cur = self.conn.execute(self.insert_sql, (*values, key or None, name, phone))
+                    if cur.rowcount == 1:
+                        added += 1
+                        # 事前確認で不通・SNS・ポータルと分かったサイトは分析に回さない
+                        if r.get("website_url") and r.get("site_ok", True):
+                            lead_ids.append(cur.lastrowid)
+                    else:
+                        skipped += 1
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.added += added
+            self.skipped += skipped
+            return added, skipped, lead_ids
+
+    def close(self):
+        with suppress(Exception):
+            self.flush()
+        self.conn.close()
+
+# ===== 名寄せ（--resolve） =====
+def geohash_cell(lat, lon, precision=GEOHASH_PRECISION):
+    """
+    緯度経度を precision 桁の geohash と同じ格子のセル番号 (経度方向, 緯度方向) にする。
+    文字列にせず整数のまま持つので、隣接セルは ±1 で求まる。
+    """
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision - lon_bits
+    x = min(int((lon + 180.0) / 360.0 * (1 << lon_bits)), (1 << lon_bits) - 1)
+    y = min(int((lat + 90.0) / 180.0 * (1 << lat_bits)), (1 << lat_bits) - 1)
+    return x, y
+
+def geohash_neighbors(cell, precision=GEOHASH_PRECISION):
+    """自セルと周囲8セル（セル境界をまたぐ近接ペアも比較対象にするため。経度は日付変更線で折り返す）"""
+    lon_cells = 1 << ((5 * precision + 1) // 2)
+    x, y = cell
+    return [((x + i) % lon_cells, y + j) for i in (-1, 0, 1) for j in (-1, 0, 1)]
+
+def resolve_name(name):
+    """名寄せ用の店名: 末尾の支店名（"　奈良店" など空白区切りのもの）を落としてから正規化"""
+    s = BRANCH_SUFFIX_RE.sub("", unicodedata.normalize("NFKC", name or "").strip())
+    return normalize_company_name(s)
+
+def site_domain(url):
+    """公式サイトのドメイン（www. を除く）。SNS・予約/ポータルなど複数店で共有されるホストは ""（判定に使わない）"""
+    with suppress(Exception):
+        host = urlparse(url if "://" in (url or "") else "http://" + (url or "")).netloc.lower().split(":")[0]
+        host = host[4:] if host.startswith("www.") else host
+        if host and not is_social_url("http://" + host) and not any(host == d or host.endswith("." + d) for d in SHARED_SITE_HOSTS):
+            return host
+    return ""
+
+class EntityResolver:
+    """
+    行（スクレイプ結果・既存leads）を同一事業者ごとのクラスタにまとめる。
+    - 電話番号（数字10桁以上）か公式サイトのドメインが同じなら距離に関係なく同一（支店・移転もまとめる）
+    - 店名が近い（正規化後に一致・包含・類似度 NAME_MATCH_RATIO 以上）ものは、geohash の隣接セル内だけで比べる
+      （電話番号かドメインがクラスタ同士で食い違う場合は別事業者とみなす。行単位だけで見ると、
+       電話番号の無い行を挟んで別々の店が連鎖的にまとまってしまうため）
+    比較は電話・ドメイン・近接セルのブロック内だけなので、全件総当たりにはならない。
+    """
+
+    def __init__(self, precision=GEOHASH_PRECISION, ratio=NAME_MATCH_RATIO):
+        self.precision = precision
+        self.ratio = ratio
+        self.rows = []
+        self.parent = []
+        self.tels = []  # 根ごとのクラスタ内の電話番号
+        self.doms = []  # 根ごとのクラスタ内のドメイン
+
+    def add(self, row):
+        self.rows.append(row)
+        self.parent.append(len(self.parent))
+
+    def _find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def _union(self, i, j):
+        a, b = self._find(i), self._find(j)
+        if a == b: return
+        keep, drop = min(a, b), max(a, b)
+        self.parent[drop] = keep
+        for sets in (self.tels, self.doms):
+            if len(sets[keep]) < len(sets[drop]):
+                sets[keep], sets[drop] = sets[drop], sets[keep]
+            sets[keep] |= sets[drop]
+            sets[drop] = set()
+
+    def _conflict(self, a, b):
+        """根 a・b のクラスタが電話番号かドメインで食い違う（両方にあって共通するものが無い）か"""
+        return any(s[a] and s[b] and s[a].isdisjoint(s[b]) for s in (self.tels, self.doms))
+
+    def _names_match(self, a, b):
+        if not a or not b: return False
+        if a == b: return True
+        if min(len(a), len(b)) >= 4 and (a in b or b in a): return True
+        if abs(len(a) - len(b)) > max(len(a), len(b)) * (1 - self.ratio): return False
+        return difflib.SequenceMatcher(None, a, b).ratio() >= self.ratio
+
+    def clusters(self):
+        """[[行インデックス, ...], ...] を返す（先頭のクラスタから入力順）"""
+        keys = [(resolve_name(r.get("company_name")), phone_digits(r.get("phone")), site_domain(r.get("website_url")))
+                for r in self.rows]
+        self.tels = [{tel} if tel else set() for _, tel, _ in keys]
+        self.doms = [{dom} if dom else set() for _, _, dom in keys]
+        # 電話番号・ドメインのブロックは連結するだけ（大きなチェーンでも線形）
+        first = {}
+        for i, (_, tel, dom) in enumerate(keys):
+            for k in (("tel:" + tel) if len(tel) >= 10 else "", ("dom:" + dom) if dom else ""):
+                if k:
+                    self._union(first.setdefault(k, i), i)
+        # 店名は近接セルの中だけで比べる
+        cells = defaultdict(list)
+        located = []
+        for i, r in enumerate(self.rows):
+            if r.get("latitude") is None or r.get("longitude") is None or not keys[i][0]:
+                continue
+            with suppress(TypeError, ValueError):
+                cell = geohash_cell(float(r["latitude"]), float(r["longitude"]), self.precision)
+                cells[cell].append(i)
+                located.append((i, cell))
+        for i, cell in located:
+            name = keys[i][0]
+            for cell in geohash_neighbors(cell, self.precision):
+                for j in cells.get(cell, ()):
+                    if j <= i:
+                        continue
+                    a, b = self._find(i), self._find(j)
+                    if a == b or self._conflict(a, b):
+                        continue
+                    if self._names_match(name, keys[j][0]):
+                        self._union(i, j)
+        groups = defaultdict(list)
+        for i in range(len(self.rows)):
+            groups[self._find(i)].append(i)
+        return sorted(groups.values(), key=lambda g: g[0])
+
+def merge_cluster(rows):
+    """
+    クラスタを1件にまとめる。項目が多く埋まっている行（同数ならクチコミ数が多い行）を代表にし、
+    空の項目は他の行で補う。cluster_id は代表行の重複判定キー（lead_dedupe_key）。
+    """
+    rep = max(rows, key=lambda r: (sum(1 for v in r.values() if v not in ("", None, [], 0)), r.get("review_count") or 0))
+    merged = dict(rep)
+    for r in rows:
+        for k, v in r.items():
+            if merged.get(k) in ("", None, []) and v not in ("", None, []):
+                merged[k] = v
+    for k in ("keywords", "areas"):
+        vals = [v for r in rows for v in (r.get(k) or [])]
+        if vals:
+            merged[k] = list(dict.fromkeys(vals))
+    socials = [u for r in rows for u in (r.get("sns_urls") or "").split()]
+    if socials:
+        merged["sns_urls"] = " ".join(dict.fromkeys(socials))
+    merged["cluster_id"] = lead_dedupe_key(rep.get("company_name"), rep.get("phone"), rep.get("google_maps_url"))
+    merged["cluster_size"] = len(rows)
+    merged["duplicates"] = [r.get("google_maps_url") or r.get("company_name") for r in rows if r is not rep]
+    lead_ids = [r["lead_id"] for r in rows if r.get("lead_id")]
+    if lead_ids:
+        merged["lead_ids"] = lead_ids
+    merged.pop("lead_id", None)
+    return merged
+
+def resolve_entities(rows, existing=()):
+    """
+    rows を名寄せして統合後の行を返す。existing（既存leads）も比較に含め、
+    既存と同一と判定された行には lead_ids を付ける（既存だけのクラスタは返さない）。
+    """
+    resolver = EntityResolver()
+    for r in rows:
+        resolver.add(r)
+    for r in existing:
+        resolver.add(r)
+    out = []
+    for group in resolver.clusters():
+        if group[0] >= len(rows):
+            continue
+        out.append(merge_cluster([resolver.rows[i] for i in group]))
+    return out
+
+def load_rows(path):
+    """スクレイプ結果（json配列 / ndjson の row 行・行オブジェクト）を読む。path が "-" なら stdin"""
+    if path == "-":
+        text = sys.stdin.read()
+    else:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    with suppress(ValueError):
+        data = json.loads(text)
+        if isinstance(data, list):
+            return data
+    rows = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line: continue
+        obj = json.loads(line)
+        if obj.get("type") == "row":
+            rows.append(obj["row"])
+        elif "company_name" in obj:
+            rows.append(obj)
+    return rows
+
+def load_leads(path):
+    """既存の leads を名寄せ用の行（lead_id 付き）として読む"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        conn.row_factory = sqlite3.Row
+        cur = conn.execute("SELECT id AS lead_id, company_name, phone, website_url, google_maps_url, "
+                           "latitude, longitude FROM leads")
+        return [dict(r) for r in cur]
+    finally:
+        conn.close()
+
+def run_resolve(args):
+    """--resolve: 保存済みの結果を名寄せして、統合した行を --format で出力する"""
+    rows = load_rows(args.resolve)
+    existing = load_leads(args.resolve_db) if args.resolve_db else []
+    started = time.monotonic()
+    merged = resolve_entities(rows, existing)
+    clustered = sum(1 for r in merged if r["cluster_size"] > 1)
+    known = sum(1 for r in merged if r.get("lead_ids"))
+    log(f"🧬 名寄せ: {len(rows)}件 → {len(merged)}件（統合 {clustered}クラスタ"
+        + (f", 既存leadと一致 {known}件" if args.resolve_db else "") + f", {time.monotonic() - started:.1f}秒）")
+    if args.format == "ndjson":
+        for r in merged:
+            print(json.dumps({"type": "row", "row": r}, ensure_ascii=False), flush=True)
+        print(json.dumps({"type": "done", "rows": len(merged)}), flush=True)
+    else:
+        print(json.dumps(merged, ensure_ascii=False), flush=True)
+
+# ===== サイト事前確認（--preflight） =====
+def site_verdict(info):
+    """
+    事前確認の結果から除外理由を返す（分析してよければ ""）。
+    dead=接続失敗・4xx/5xx, not_html=HTML以外, portal=転送先がSNS・ポータル・Google
+    """
+    status = info.get("site_status") or 0
+    if not 200 <= status < 400:
+        return "dead"
+    ctype = (info.get("site_content_type") or "").lower()
+    if ctype and "html" not in ctype:
+        return "not_html"
+    final = info.get("site_final_url") or ""
+    if is_social_url(final) or is_block_website(final) or not site_domain(final):
+        return "portal"
+    return ""
+
+def _is_ssl_error(e):
+    if isinstance(e, ssl.SSLError) or isinstance(getattr(e, "reason", None), ssl.SSLError):
+        return True
+    return aiohttp is not None and isinstance(e, aiohttp.ClientSSLError)
+
+class SitePreflight:
+    """
+    行の公式サイトURLを非同期でまとめて確認し、site_* を付けてから出力へ渡す。
+    専用スレッドのイベントループで動き、同時接続は全体で concurrency、ホストごとに per_host まで。
+    aiohttp があれば接続プール付きのクライアントを、無ければ urllib をスレッドプールで使う。同じURLは1回だけ確認する。
+    付ける項目: site_status（接続失敗は0）, site_final_url, site_content_type, site_tls（valid / invalid / none）,
+               site_ms, site_ok（分析対象にしてよいか）, site_error
+    """
+
+    def __init__(self, concurrency=PREFLIGHT_CONCURRENCY, per_host=PREFLIGHT_PER_HOST, timeout=PREFLIGHT_TIMEOUT):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.results = {}
+        self.stats = defaultdict(int)
+        self.pending = 0
+        self.idle = threading.Condition()
+        self.session = None
+        self.executor = None if aiohttp else ThreadPoolExecutor(concurrency, thread_name_prefix="preflight")
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.limit = None
+        self.host_limits = {}
+
+    def submit(self, row, done):
+        """row を確認してから done(row) を呼ぶ（サイトが無ければその場で呼ぶ）"""
+        if not row.get("website_url"):
+            done(row)
+            return
+        with self.idle:
+            self.pending += 1
+        asyncio.run_coroutine_threadsafe(self._annotate(row, done), self.loop)
+
+    async def _annotate(self, row, done):
+        try:
+            url = row["website_url"]
+            task = self.results.get(url)
+            if task is None:
+                task = self.results[url] = asyncio.ensure_future(self._check(url))
+            row.update(await task)
+            done(row)
+        except Exception as e:
+            log(f"⚠ サイト事前確認後の出力でエラー: {e}")
+        finally:
+            with self.idle:
+                self.pending -= 1
+                self.idle.notify_all()
+
+    async def _check(self, url):
+        if self.limit is None:
+            self.limit = asyncio.Semaphore(self.concurrency)
+        target = url if "://" in url else "http://" + url
+        host = urlparse(target).netloc.lower()
+        host_limit = self.host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        started = time.monotonic()
+        async with self.limit, host_limit:
+            try:
+                try:
+                    info = await asyncio.wait_for(self._fetch(target, True), self.timeout)
+                    info["site_tls"] = "valid" if info["site_final_url"].startswith("https:") else "none"
+                except Exception as e:
+                    if not _is_ssl_error(e):
+                        raise
+                    info = await asyncio.wait_for(self._fetch(target, False), self.timeout)
+                    info["site_tls"] = "invalid"
+            except Exception as e:
+                info = {"site_status": 0, "site_final_url": "", "site_content_type": "", "site_tls": "",
+                        "site_error": "timeout" if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"[:200]}
+        info["site_ms"] = round((time.monotonic() - started) * 1000)
+        reason = site_verdict(info)
+        info["site_ok"] = not reason
+        self.stats[reason or "ok"] += 1
+        return info
+
+    async def _fetch(self, url, verify):
+        if aiohttp is None:
+            return await self.loop.run_in_executor(self.executor, self._fetch_sync, url, verify)
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector, headers={"User-Agent": PREFLIGHT_UA})
+        async with self.session.get(url, ssl=None if verify else False, allow_redirects=True,
+                                    max_redirects=PREFLIGHT_MAX_REDIRECTS) as resp:
+            # 小さい本文は読み切って接続を再利用する。Content-Length の無い（chunked）応答も数えながら読み、
+            # PREFLIGHT_MAX_BODY を超えたら打ち切る（その接続は再利用せず閉じる）
+            if (resp.content_length or 0) <= PREFLIGHT_MAX_BODY:
+                read = 0
+                async for chunk in resp.content.iter_any():
+                    read += len(chunk)
+                    if read > PREFLIGHT_MAX_BODY:
+                        break
+            return {"site_status": resp.status, "site_final_url": str(resp.url),
+                    "site_content_type": resp.headers.get("Content-Type", "")}
+
+    def _fetch_sync(self, url, verify):
+        ctx = None if verify else ssl._create_unverified_context()
+        try:
+            resp = urlopen(Request(url, headers={"User-Agent": PREFLIGHT_UA}), timeout=self.timeout, context=ctx)
+        except HTTPError as e:
+            resp = e  # 4xx/5xx もステータスとして記録する
+        with resp:  # 本文は読まない（urllib は接続を再利用しないので、読み切る意味が無い）
+            return {"site_status": resp.code, "site_final_url": resp.geturl(),
+                    "site_content_type": resp.headers.get("Content-Type", "")}
+
+    def drain(self):
+        """確認中の行がすべて出力されるまで待つ"""
+        with self.idle:
+            self.idle.wait_for(lambda: self.pending == 0)
+
+    def summary(self):
+        s = self.stats
+        checked = sum(s.values())
+        return (f"🌐 サイト事前確認: {checked}件 / 分析対象 {s['ok']}件 / 除外: 不通 {s['dead']}件, "
+                f"SNS・ポータル {s['portal']}件, HTML以外 {s['not_html']}件")
+
+    def close(self):
+        self.drain()
+        if self.session:
+            with suppress(Exception):
+                asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        if self.executor:
+            self.executor.shutdown(wait=False)
+
+# ===== 出力 =====
+class ResultWriter:
+    """
+    抽出結果の出力先（stdout）。
+    - json  : 全件をためて終了時に配列1つを出力（従来形式）
+    - ndjson: {"type":"row"} を1行ずつ即時flushし、エリア完了時と一定間隔で
+              {"type":"checkpoint"} を、終了時に {"type":"done"} を出力
+    write を渡すとstdoutの代わりにそれへ1件ずつ渡し、extra（例: {"job": id}）を各行に付ける。
+    sink（SqliteSink）を渡すと行はDBへ直接書き、ndjson では row 行の代わりに
+    書き込みごとの {"type":"stored","added","skipped","lead_ids"} を出力する。
+    area_check があれば出力前に住所を分割し、検索エリア外の行は出力しない。
+    preflight（SitePreflight）を渡すと公式サイトの確認結果を付けてから出力する（確認が終わった順）。
+    """
+
+    def __init__(self, fmt="json", checkpoint_interval=CHECKPOINT_INTERVAL, write=None, extra=None, sink=None,
+                 preflight=None):
+        self.fmt = fmt
+        self.checkpoint_interval = checkpoint_interval
+        self.write = write
+        self.extra = extra or {}
+        self.sink = sink
+        self.preflight = preflight
+        self.area_check = None  # AreaCheck（ScrapeSession.run が検索エリアに合わせて設定）
+        self.lock = threading.Lock()
+        self.rows = []
+        self.count = 0
+        self.started = time.monotonic()
+        self.last_checkpoint = self.started
+
+    def _write(self, obj):
+        if isinstance(obj, dict) and self.extra:
+            obj = {**self.extra, **obj}
+        if self.write:
+            self.write(obj)
+            return
+        print(json.dumps(obj, ensure_ascii=False), file=sys.stdout, flush=True)
+
+    def emit(self, row, seq=None):
+        with self.lock:
+            if self.area_check:
+                row = self.area_check.apply(row)
+                if row is None:
+                    return
+        if self.preflight:
+            self.preflight.submit(row, lambda r: self._emit(r, seq))
+        else:
+            self._emit(row, seq)
+
+    def _emit(self, row, seq):
+        with self.lock:
+            self.count += 1
+            if self.sink and self.sink.add(row):
+                self._store()
+            if self.fmt != "ndjson":
+                self.rows.append((self.count if seq is None else seq, row))
+                return
+            if not self.sink:
+                self._write({"type": "row", "row": row})
+            if time.monotonic() - self.last_checkpoint >= self.checkpoint_interval:
+                self._checkpoint()
+
+    def _store(self):
+        """sink にためた行をDBへ書く（失敗しても抽出は止めない）"""
+        try:
+            added, skipped, lead_ids = self.sink.flush()
+        except Exception as e:
+            log(f"❌ DB保存エラー: {e}")
+            return
+        if self.fmt == "ndjson" and (added or skipped):
+            self._write({"type": "stored", "added": added, "skipped": skipped, "lead_ids": lead_ids})
+
+    def update(self, row):
+        """
+        出力済みの行に一致キーワード・エリアが増えたことを伝える。
+        json は同じ行オブジェクトを保持しているので最終出力に反映され、ndjson は {"type":"match"} を出す。
+        """
+        with self.lock:
+            if self.fmt != "ndjson": return
+            self._write({"type": "match", "google_maps_url": row.get("google_maps_url", ""),
+                         "keywords": list(row.get("keywords") or []), "areas": list(row.get("areas") or [])})
+
+    def refresh(self, known_url, meta):
+        """既知プレイスの一覧上の評価・クチコミ数を伝える（ndjson のみ {"type":"refresh"}）"""
+        with self.lock:
+            if self.fmt != "ndjson": return
+            self._write({"type": "refresh", "google_maps_url": known_url,
+                         "review_count": meta.get("review_count") or 0, "rating": meta.get("rating")})
+
+    def checkpoint(self, **info):
+        with self.lock:
+            self._checkpoint(**info)
+
+    def flush(self):
+        """事前確認中の行を出し切り、sink に残った行をDBへ書く（常駐モードのジョブ終了時）"""
+        if self.preflight:
+            self.preflight.drain()
+        with self.lock:
+            if self.sink:
+                self._store()
+
+    def _checkpoint(self, **info):
+        self.last_checkpoint = time.monotonic()
+        if self.sink:
+            self._store()
+        if self.fmt != "ndjson": return
+        self._write({"type": "checkpoint", "rows": self.count,
+                     "elapsed_s": round(self.last_checkpoint - self.started, 1), **info})
+
+    def close(self):
+        if self.preflight:
+            self.preflight.drain()
+        with self.lock:
+            if self.sink:
+                self._store()
+            if self.fmt == "ndjson":
+                self._write({"type": "done", "rows": self.count})
+            else:
+                self._write([row for _, row in sorted(self.rows, key=lambda x: x[0])])
+
+# ===== 並列抽出ワーカー =====
+def build_chrome_options(headless, lean=False, profile_dir=None):
     options = Options()
-    if args.headless:
+    if profile_dir:
+        # 同意Cookie・ログイン状態・ディスクキャッシュを次回の実行に引き継ぐ
+        options.add_argument(f"--user-data-dir={profile_dir}")
+        options.add_argument("--profile-directory=Default")
+    if headless:
         options.add_argument("--headless=new")
     options.add_argument("--start-maximized")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--disable-gpu")
     options.add_argument("--lang=ja")
+    # タブプールでは裏のタブで読み込みを進めるので、バックグラウンドタブの間引きを止める
+    options.add_argument("--disable-background-timer-throttling")
+    options.add_argument("--disable-backgrounding-occluded-windows")
+    options.add_argument("--disable-renderer-backgrounding")
+    if lean:
+        # 画像はコンテンツ設定で全タブ一括オフ、残りは apply_lean_profile でタブごとにブロック
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--disable-remote-fonts")
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.media_stream": 2,
+        })
+    return options
 
-    try:
-        driver = webdriver.Chrome(options=options)
-    except Exception as e:
-        print(json.dumps({"error": f"Chrome起動失敗: {str(e)}"}), file=sys.stdout)
-        sys.exit(1)
+def profile_path(slot):
+    """--profile-dir 使用時の slot（main / worker1…）用ディレクトリ。同じディレクトリは同時に1つのChromeしか使えない"""
+    if not PROFILE_DIR: return None
+    path = os.path.join(PROFILE_DIR, slot)
+    os.makedirs(path, exist_ok=True)
+    # 異常終了したChromeのロックが残っていると起動できないので、持ち主のプロセスが無ければ消す
+    lock = os.path.join(path, "SingletonLock")
+    with suppress(OSError, ValueError):
+        pid = int(os.readlink(lock).rsplit("-", 1)[1])
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            for name in ("SingletonLock", "SingletonSocket", "SingletonCookie"):
+                with suppress(OSError):
+                    os.unlink(os.path.join(path, name))
+    return path
 
-    all_results = []
+def launch_chrome(headless, lean=False, slot="main"):
+    """Chromeを起動する（lean 設定込み）。再起動時に同じプロファイルを使えるよう slot を driver に覚えさせる"""
+    drv = webdriver.Chrome(options=build_chrome_options(headless, lean, profile_path(slot)))
+    drv.profile_slot = slot
+    if lean:
+        apply_lean_profile(drv)
+    return drv
 
-    try:
-        for city_idx, city in enumerate(cities, 1):
-            query = city + keyword_suffix
-            log(f"\n🔎 [{city_idx}/{len(cities)}] 検索: {query}")
+def tag_row(row, city, keyword):
+    row["area"] = city
+    row["industry"] = keyword
+    row["keywords"] = [keyword]
+    row["areas"] = [city]
+    return row
 
-            search_url = f"https://www.google.co.jp/maps/search/?api=1&query={quote_plus(query)}&hl=ja"
-            driver.get(search_url)
-            with suppress(Exception):
-                handle_google_consent(driver, timeout=8)
-            time.sleep(3)
+class MatchIndex:
+    """
+    1回の実行内で、プレイス（place_key）ごとに一致したキーワード・エリアをまとめる。
+    同じプレイスの詳細抽出は最初の一致時だけ行い、以降の一致は keywords / areas に追記する。
+    skipped: 省略した件数（page=同じ検索のページ間, task=別のエリア・キーワードの検索間,
+             coord=格子検索の同一座標, known=--known で既知のプレイス）
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.skipped = defaultdict(int)
+
+    def summary(self):
+        coord = f" / 座標 {self.skipped['coord']}件" if self.skipped.get("coord") else ""
+        known = f" / 既知 {self.skipped['known']}件" if self.skipped.get("known") else ""
+        return (f"🧩 重複スキップ: ページ間 {self.skipped['page']}件 / 検索間 {self.skipped['task']}件{coord}{known}"
+                f"（ユニーク {len(self.entries)}件）")
+
+    def add(self, url, keyword, city):
+        """
+        一致を記録する。戻り値: (初めてのURLか, 追記が発生した出力済みの行 or None)
+        """
+        key = place_key(url)
+        with self.lock:
+            e = self.entries.get(key)
+            new = e is None
+            if new:
+                e = self.entries[key] = {"keywords": [], "areas": [], "row": None}
+            else:
+                self.skipped["task"] += 1
+            changed = False
+            if keyword not in e["keywords"]:
+                e["keywords"].append(keyword)
+                changed = True
+            if city not in e["areas"]:
+                e["areas"].append(city)
+                changed = True
+            return new, (e["row"] if changed and not new else None)
+
+    def tag(self, url, row):
+        """抽出した行に、ここまでに一致した全キーワード・エリアを付ける（area/industry は最初の一致）"""
+        with self.lock:
+            e = self.entries[place_key(url)]
+            row["area"] = e["areas"][0]
+            row["industry"] = e["keywords"][0]
+            row["keywords"] = e["keywords"]
+            row["areas"] = e["areas"]
+            e["row"] = row
+        return row
+
+class ExtractPool:
+    """
+    プレイスURLを共有キューで受け取り、独立したChromeセッションで並列に抽出する。
+    - フィード収集はメインのdriverのまま（submitでURLを投入するだけ）
+    - 結果は投入順（seq）付きでwriterへ渡すので、json出力は単一driver時と同じ並びになる
+    - cancel（threading.Event）がセットされたら、キューに残ったURLは開かずに消化する
+    - matches（MatchIndex）を渡すと、行には一致した全キーワード・エリアを付ける
+    """
+
+    def __init__(self, drivers, keyword, writer, cache=None, tabs=1, cancel=None, matches=None):
+        self.keyword = keyword
+        self.matches = matches
+        self.writer = writer
+        self.cache = cache
+        self.tabs = tabs
+        self.cancel = cancel or threading.Event()
+        self.tasks = queue.Queue()
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.city_pending = {}
+        self.city_saved = {}
+        self.city_closed = set()
+        self.deferred = []  # タイムアウトで後回しにした (seq, url, city)
+        self.error = None  # ワーカーのChromeを失った（BrowserLost）ときの例外
+        self.drivers = drivers
+        self.threads = []
+        for wid, drv in enumerate(drivers, 1):
+            t = threading.Thread(target=self._run, args=(wid, drv), daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def submit(self, url, city):
+        with self.lock:
+            self.seq += 1
+            seq = self.seq
+            self.city_pending[city] = self.city_pending.get(city, 0) + 1
+            self.city_saved.setdefault(city, 0)
+        self.tasks.put((seq, url, city))
+
+    def finish_city(self, city):
+        """このエリアのURL投入が終わったことを通知する（全件処理済みなら完了ログを出す）"""
+        with self.lock:
+            self.city_closed.add(city)
+            self.city_pending.setdefault(city, 0)
+            self.city_saved.setdefault(city, 0)
+            self._maybe_log_city_done(city)
+
+    def _maybe_log_city_done(self, city):
+        if city in self.city_closed and self.city_pending.get(city, 0) == 0:
+            log(f"✅ {city}: {self.city_saved.get(city, 0)} 件取得完了")
+            self.city_closed.discard(city)
+            self.writer.checkpoint(city=city)
+
+    def _finish(self, seq, url, city, row):
+        with self.lock:
+            self.city_pending[city] -= 1
+            if row and row.get("company_name"):
+                row = self.matches.tag(url, row) if self.matches else tag_row(row, city, self.keyword)
+                self.writer.emit(row, seq=seq)
+                self.city_saved[city] += 1
+                if self.city_saved[city] % 5 == 0:
+                    log(f"  … {self.city_saved[city]} 件取得中")
+            self._maybe_log_city_done(city)
 
-            all_urls = set()
-            page = 1
-            while page <= args.max_pages:
+    def _defer(self, seq, url, city):
+        with self.lock:
+            self.deferred.append((seq, url, city))
+
+    def _driver(self, wid):
+        return self.drivers[wid - 1]
+
+    def _recycle(self, wid, reason):
+        """しきい値を超えたワーカーのChromeを入れ替える（self.drivers を差し替えるので close() も新しい方を閉じる）"""
+        try:
+            fresh = health.recycle(self._driver(wid), reason, f"[W{wid}] ")
+        except BrowserLost as e:
+            # 残りのURLは開かずに消化し、join() の後で呼び出し側が打ち切る
+            log(f"✖ {e}")
+            self.error = e
+            self.cancel.set()
+            return
+        if fresh:
+            self.drivers[wid - 1] = fresh
+
+    def _run(self, wid, drv):
+        finished = False
+        while self.tabs > 1 and not finished:
+            finished = self._run_tabs(wid)
+            if finished is None:  # タブプールを作れない
+                break
+        if not finished:
+            self._run_sequential(wid)
+        self._drain_deferred(wid)
+
+    def _run_sequential(self, wid):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return
+            drv = self._driver(wid)
+            seq, url, city = task
+            if self.cancel.is_set():
+                self._finish(seq, url, city, None)
+                continue
+            row = None
+            timed_out = []
+            try:
+                row = extract_place(drv, url, self.cache, on_timeout=timed_out.append)
+            except Exception as e:
+                log(f"  ✖ [W{wid}] 抽出エラー: {url} / {e}")
+            if timed_out:
+                self._defer(seq, url, city)
+            else:
+                self._finish(seq, url, city, row)
+            reason = health.check(drv)
+            if reason:
+                self._recycle(wid, reason)
+
+    def _drain_deferred(self, wid):
+        """後回しにしたURLを新しいタブ・長めのタイムアウトで再試行する（終了シグナル後に各ワーカーで実行）"""
+        while True:
+            with self.lock:
+                if not self.deferred: return
+                seq, url, city = self.deferred.pop(0)
+            row = None
+            if self.cancel.is_set():
+                self._finish(seq, url, city, row)
+                continue
+            try:
+                row = retry_place(self._driver(wid), url, self.cache)
+            except Exception as e:
+                log(f"  ✖ [W{wid}] 再試行エラー: {url} / {e}")
+            self._finish(seq, url, city, row)
+
+    def _run_tabs(self, wid):
+        """
+        タブプールで処理する。終了シグナルまで処理できたら True、Chrome再起動のため中断したら False、
+        タブプールを作れない・途中で失敗したら None（逐次処理に戻る）
+        """
+        drv = self._driver(wid)
+        try:
+            tabs = open_tab_pool(drv, self.tabs)
+        except Exception as e:
+            log(f"⚠ [W{wid}] タブプールを作れないため逐次処理: {e}")
+            return None
+
+        finished = []
+        recycle = []
+
+        def next_task(block):
+            # 全タブが空いた時点（block=True）でだけ再起動を判定する
+            if block:
+                reason = health.check(drv)
+                if reason:
+                    recycle.append(reason)
+                    return None
+            while True:
                 try:
-                    feed = WebDriverWait(driver, 8).until(
-                        EC.presence_of_element_located((By.XPATH, '//div[@role="feed"]'))
-                    )
-                except TimeoutException:
-                    break
+                    task = self.tasks.get() if block else self.tasks.get_nowait()
+                except queue.Empty:
+                    return False
+                if task is None:
+                    finished.append(True)
+                    return None
+                seq, url, city = task
+                if not self.cancel.is_set():
+                    return url, (seq, city)
+                self._finish(seq, url, city, None)
+
+        try:
+            run_tab_pipeline(tabs, next_task, lambda url, ctx, row: self._finish(ctx[0], url, ctx[1], row), self.cache,
+                             on_timeout=lambda url, ctx: self._defer(ctx[0], url, ctx[1]))
+        except Exception as e:
+            log(f"  ✖ [W{wid}] タブプール処理エラー: {e}")
+        finally:
+            tabs.close()
+        if recycle:
+            self._recycle(wid, recycle[0])
+            return False
+        return True if finished else None
 
-                cards = scroll_feed_to_bottom(driver, feed)
-                log(f"📦 ページ{page} カード数: {cards}")
+    def join(self):
+        """全タスクの完了を待つ"""
+        for _ in self.threads:
+            self.tasks.put(None)
+        for t in self.threads:
+            t.join()
 
-                urls = collect_place_urls_from_feed(driver, feed, expect_min=cards)
-                all_urls.update(urls)
-                log(f"🔗 ページ{page}: URL {len(urls)}件 / 累計 {len(all_urls)}件")
+    def close(self):
+        for drv in self.drivers:
+            with suppress(Exception):
+                drv.quit()
 
-                if click_next_page_if_exists(driver):
-                    page += 1
-                    continue
+def launch_worker_drivers(n, headless, lean=False):
+    """ワーカー用Chromeをn個起動する（起動できた分だけ返す）"""
+    drivers = []
+    for i in range(1, n + 1):
+        try:
+            drv = launch_chrome(headless, lean, f"worker{i}")
+        except Exception as e:
+            log(f"⚠ ワーカー{i}のChrome起動失敗: {e}")
+            continue
+        with suppress(Exception):
+            open_maps_home(drv)
+        drivers.append(drv)
+    return drivers
+
+
+# ===== セッション（Chrome群・キャッシュ） =====
+def _driver_alive(drv):
+    try:
+        drv.current_url
+        return True
+    except Exception:
+        return False
+
+class ScrapeSession:
+    """
+    フィード用driver・ワーカー用Chrome・タブプール・キャッシュをまとめて持つ。
+    CLI実行では1回使って閉じ、常駐モード（--serve）ではジョブをまたいで使い回す。
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.driver = None
+        self.worker_drivers = []
+        self.tab_pool = None
+        self.cache = None
+        self.preflight = None
+        self.sink = self._open_sink()  # Chromeより先に開く（開けなければ SinkError。Chromeは起動しない）
+        # 以降の失敗は呼び出し側で扱う（起動済みのChrome・DBは閉じてから投げ直す）
+        try:
+            self.cache = self._open_cache()
+            if args.preflight:
+                self.preflight = SitePreflight(args.preflight_concurrency, args.preflight_per_host, args.preflight_timeout)
+                log(f"🌐 サイト事前確認: 同時 {args.preflight_concurrency}（ホストごと {args.preflight_per_host}）"
+                    + ("" if aiohttp else " / aiohttp が無いため urllib で確認"))
+            self.driver = self._launch_driver()
+            if args.lean:
+                log("🪶 leanモード: 画像・フォント・地図タイル・計測系リクエストをブロック")
+
+            if args.workers > 1:
+                self.worker_drivers = launch_worker_drivers(args.workers, args.headless, args.lean)
+                if self.worker_drivers:
+                    log(f"🧵 並列抽出: ワーカー {len(self.worker_drivers)} 台")
                 else:
-                    break
+                    log("⚠ ワーカーを起動できなかったため逐次処理で続行します")
 
-            # 各プレイス抽出
-            saved = 0
-            for idx, u in enumerate(list(all_urls), 1):
-                try:
-                    row = open_and_extract(driver, u)
-                    if row and row.get("company_name"):
-                        row["area"] = city
-                        row["industry"] = args.keyword
-                        all_results.append(row)
-                        saved += 1
-                        if saved % 5 == 0:
-                            log(f"  … {saved} 件取得中")
-                except Exception as e:
-                    log(f"  ✖ {idx}件目でエラー: {e}")
+            self._open_tab_pool()
+        except BaseException:
+            self.close()
+            raise
+
+    def _launch_driver(self):
+        return launch_chrome(self.args.headless, self.args.lean, "main")
+
+    def _open_cache(self):
+        args = self.args
+        if not args.cache:
+            return None
+        try:
+            cache = PlaceCache(args.cache, args.cache_ttl_days, args.cache_max_entries)
+            evicted = cache.evict()
+            log(f"💾 キャッシュ使用: {args.cache}（TTL {args.cache_ttl_days}日, 期限切れ削除 {evicted}件）")
+            return cache
+        except Exception as e:
+            log(f"⚠ キャッシュを開けないため無効化: {e}")
+            return None
+
+    def _open_sink(self):
+        path = self.args.sqlite
+        if not path:
+            return None
+        try:
+            sink = SqliteSink(path)  # 開けないときは保存先が無いまま進めず、起動失敗として扱う
+        except Exception as e:
+            raise SinkError(f"{path}: {e}") from e
+        note = ""
+        if sink.backfilled:
+            note = (f"（既存 {sink.backfilled}件に重複判定キーを付与"
+                    + (f"、重複 {sink.collisions}件はキーなし" if sink.collisions else "") + "）")
+        log(f"🗄 DBへ直接保存: {path}{note}")
+        return sink
+
+    def _area_check(self, names, drop):
+        try:
+            return AreaCheck(names, drop)
+        except Exception as e:
+            log(f"⚠ 住所の市区町村表を読めないためエリア照合を無効化: {e}")
+            return None
+
+    def _open_tab_pool(self):
+        self.tab_pool = None
+        if self.args.tabs > 1 and not self.worker_drivers:
+            try:
+                self.tab_pool = open_tab_pool(self.driver, self.args.tabs)
+                log(f"🗂 タブプール: {self.args.tabs} タブで読み込みを並行")
+            except Exception as e:
+                log(f"⚠ タブプールを作れないため1タブずつ処理します: {e}")
+
+    def _recycle_main(self, reason):
+        """メインのChromeを入れ替えてタブプールを作り直す。(driver, tab_pool) を返す"""
+        fresh = health.recycle(self.driver, reason, "メイン")
+        if fresh:
+            self.driver = fresh
+            self._open_tab_pool()
+        return self.driver, self.tab_pool
+
+    def ensure_alive(self):
+        """ジョブの前に、落ちているChromeがあれば起動し直す"""
+        if not _driver_alive(self.driver):
+            log("♻ Chromeが応答しないため再起動します")
+            with suppress(Exception):
+                self.driver.quit()
+            self.driver = self._launch_driver()
+            with suppress(Exception):
+                open_maps_home(self.driver)
+            self._open_tab_pool()
+        for i, drv in enumerate(self.worker_drivers):
+            if _driver_alive(drv):
+                continue
+            log(f"♻ ワーカー{i + 1}のChromeを再起動します")
+            with suppress(Exception):
+                drv.quit()
+            fresh = None
+            try:
+                fresh = launch_chrome(self.args.headless, self.args.lean, getattr(drv, "profile_slot", f"worker{i + 1}"))
+                with suppress(Exception):
+                    open_maps_home(fresh)
+            except Exception as e:
+                log(f"⚠ ワーカー{i + 1}のChrome起動失敗: {e}")
+            self.worker_drivers[i] = fresh
+        self.worker_drivers = [d for d in self.worker_drivers if d]
+
+    def run(self, keywords, cities, max_pages, writer, cancel=None, grid=None, known=None, refresh_known=False):
+        """
+        キーワード×エリアの検索→詳細抽出を行い、行をwriterへ出す。cancel がセットされたら途中で終える。
+        エリアごとに全キーワードを検索し、複数の検索で見つかったプレイスの詳細は1回だけ抽出する。
+        grid（parse_grid_areas の結果）を渡すとエリア名検索の代わりに格子検索を行う。
+        known（known_index の結果）にあるプレイスは開かず、refresh_known なら一覧上のクチコミ数だけ出す。
+        """
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        areas = grid or cities
+        # 格子検索の結果は範囲（bbox / polygon）で絞り込み済みなので、住所の分割だけ行い除外はしない
+        writer.area_check = self._area_check([a["name"] for a in grid] if grid else cities,
+                                             drop=not (grid or self.args.keep_other_areas))
+        matches = MatchIndex()
+        seen_coords = set()
+        refreshed = set()
+        pool = None
+        if self.worker_drivers:
+            pool = ExtractPool(self.worker_drivers, keywords[0], writer, self.cache, self.args.tabs, cancel, matches)
+
+        try:
+            for city_idx, area in enumerate(areas, 1):
+                city = area["name"] if grid else area
+                saved = 0
+                # エリアの切れ目は処理中のタブが無いので、しきい値の手前でも再起動しておく
+                if city_idx > 1:
+                    reason = health.check(self.driver, soft=True)
+                    if reason:
+                        self._recycle_main(reason)
+
+                def on_row(u, row):
+                    nonlocal saved
+                    writer.emit(matches.tag(u, row))
+                    saved += 1
+                    if saved % 5 == 0:
+                        log(f"  … {saved} 件取得中")
+
+                for keyword in keywords:
+                    if cancel and cancel.is_set():
+                        break
+                    query = f"{city}　{keyword}"
+                    log(f"\n🔎 [{city_idx}/{len(areas)}] 検索: {query}")
+
+                    if grid:
+                        batches = grid_sweep(self.driver, area, keyword, cancel, matches.skipped, seen_coords,
+                                             self.args.grid_full, self.args.grid_max_depth)
+                    else:
+                        batches = [search_and_collect(self.driver, query, max_pages, city, cancel, matches.skipped)]
+
+                    # 検索（格子検索ならセル）ごとに、初出のプレイスだけ抽出へ回す
+                    for found in batches:
+                        fresh = []
+                        for u, meta in found.items():
+                            if known:
+                                key = place_key(u)
+                                if key in known:
+                                    matches.skipped["known"] += 1
+                                    if refresh_known and key not in refreshed:
+                                        refreshed.add(key)
+                                        writer.refresh(known[key], meta)
+                                    continue
+                            new, updated = matches.add(u, keyword, city)
+                            if new:
+                                fresh.append(u)
+                            elif updated is not None:
+                                writer.update(updated)
+                        if len(keywords) > 1 or grid:
+                            log(f"🧩 新規 {len(fresh)}件（他の検索で取得済みのため省略: 累計 {matches.skipped['task']}件）")
+
+                        if pool:
+                            for u in fresh:
+                                pool.submit(u, city)
+                            continue
+                        extract_urls_inline(self.driver, fresh, on_row, self.cache, self.tab_pool, cancel,
+                                            recycle=self._recycle_main)
+
+                if cancel and cancel.is_set():
+                    log("⏹ キャンセルされたため残りの検索をスキップします")
+                    if pool:
+                        pool.finish_city(city)
+                    break
+                if pool:
+                    pool.finish_city(city)
                     continue
-            log(f"✅ {city}: {saved} 件取得完了")
+                log(f"✅ {city}: {saved} 件取得完了")
+                writer.checkpoint(city=city)
+        except BaseException:
+            # 例外時は残りのURLを開かずにワーカーを止める（Chromeは次のジョブで使い回す）
+            if pool:
+                pool.cancel.set()
+            raise
+        finally:
+            if pool:
+                pool.join()
+        if pool and pool.error:
+            raise pool.error
+        log(matches.summary())
+        if writer.area_check and (writer.area_check.moved or writer.area_check.dropped or writer.area_check.unverified):
+            log(writer.area_check.summary())
+        if refreshed:
+            log(f"🔄 既知プレイスのクチコミ数を更新: {len(refreshed)}件")
+
+    def report(self, places):
+        if page_stats.summary():
+            log(page_stats.summary())
+        metrics.report(places)
+        log(scheduler.summary())
+        if health.recycled:
+            log(health.summary())
+        if self.cache:
+            log(f"💾 キャッシュ: ヒット {self.cache.hits}件 / ミス {self.cache.misses}件")
+        if self.preflight and self.preflight.stats:
+            log(self.preflight.summary())
+        if self.sink:
+            log(f"🗄 DB保存: 追加 {self.sink.added}件 / 重複・無効 {self.sink.skipped}件")
+
+    def close(self):
+        for drv in self.worker_drivers + [self.driver]:
+            if drv is None: continue
+            with suppress(Exception):
+                drv.quit()
+        if self.cache:
+            self.cache.close()
+        if self.preflight:
+            self.preflight.close()
+        if self.sink:
+            self.sink.close()
 
+
+# ===== 常駐モード（--serve） =====
+class JobChannel:
+    """応答を1行1JSONで書き出す（受付スレッドとジョブ実行スレッドの両方から呼ばれる）"""
+
+    def __init__(self, write):
+        self._write = write
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def send(self, obj):
+        if self.closed: return
+        line = json.dumps(obj, ensure_ascii=False) + "\n"
+        with self.lock:
+            try:
+                self._write(line)
+            except Exception:
+                self.closed = True  # 接続が切れたら以降の応答は捨てる
+
+class ScrapeJob:
+    def __init__(self, req, channel):
+        self.id = str(req.get("id") or f"job-{int(time.time() * 1000)}")
+        self.keywords = req.get("keywords") or [req["keyword"]]
+        self.grid = parse_grid_areas(req["grid"]) if req.get("grid") else None
+        self.cities = req.get("cities") or []
+        self.known = known_index(req["known"]) if req.get("known") else None
+        self.known_db = bool(req.get("known_db"))  # 既知プレイスを --sqlite のDBから読む
+        self.refresh_known = bool(req.get("refresh_known"))
+        self.max_pages = int(req.get("max_pages") or 5)
+        self.channel = channel
+        self.cancel = threading.Event()
+
+    def send(self, type_, **fields):
+        self.channel.send({"job": self.id, "type": type_, **fields})
+
+class ScrapeDaemon:
+    """
+    Chromeを起動したまま、1行1JSONのリクエストでスクレイピングジョブを受け付ける。
+    リクエスト: {"op":"scrape","id":..,"keyword":..（または "keywords":[..]）,"cities":[..]（または "grid":..）,"max_pages":5,
+               "known":[既知URL..],"known_db":false,"refresh_known":false}
+               known_db=true なら既知プレイスを --sqlite のDB（leads.google_maps_url）から読む
+               {"op":"cancel","id":..} / {"op":"ping"} / {"op":"shutdown"}
+    応答: queued / progress / row / match / refresh / checkpoint / cancelling / done（いずれも "job" 付き）, error, pong, bye
+    ジョブは到着順に1件ずつ実行する（ワーカー・タブによる並列化は各ジョブの中で行う）。
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.active = {}
+        self.current = None
+        self.stopping = threading.Event()
+        self.runner = threading.Thread(target=self._run_jobs, daemon=True)
+        self.runner.start()
+
+    def handle(self, line, channel):
+        """リクエスト1行を処理する。shutdown を受けたら False を返す"""
+        line = line.strip()
+        if not line:
+            return True
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("JSONオブジェクトが必要です")
+        except ValueError as e:
+            channel.send({"type": "error", "error": f"リクエスト解析エラー: {e}"})
+            return True
+
+        op = req.get("op", "scrape")
+        if op == "scrape":
+            self._enqueue(req, channel)
+        elif op == "cancel":
+            with self.lock:
+                job = self.active.get(str(req.get("id")))
+            if job:
+                job.cancel.set()
+                job.send("cancelling")
+            else:
+                channel.send({"type": "error", "job": req.get("id"), "error": "該当するジョブがありません"})
+        elif op == "ping":
+            channel.send({"type": "pong", "busy": self.current, "queued": self.jobs.qsize()})
+        elif op == "shutdown":
+            self.cancel_all()
+            channel.send({"type": "bye"})
+            return False
+        else:
+            channel.send({"type": "error", "error": f"不明なop: {op}"})
+        return True
+
+    def _enqueue(self, req, channel):
+        cities = req.get("cities")
+        keywords = req.get("keywords")
+        has_keywords = isinstance(keywords, list) and keywords and all(isinstance(k, str) and k for k in keywords)
+        if not (req.get("keyword") or has_keywords) or not (req.get("grid") or isinstance(cities, list) and cities):
+            channel.send({"type": "error", "job": req.get("id"),
+                          "error": "keyword（または keywords 配列）と cities（配列）または grid が必要です"})
+            return
+        if self.stopping.is_set():
+            channel.send({"type": "error", "job": req.get("id"), "error": "停止処理中のため受け付けできません"})
+            return
+        try:
+            job = ScrapeJob(req, channel)
+        except (KeyError, TypeError, ValueError) as e:
+            channel.send({"type": "error", "job": req.get("id"), "error": f"リクエストの形式が不正です（grid / known）: {e}"})
+            return
+        with self.lock:
+            if job.id in self.active:
+                channel.send({"type": "error", "job": job.id, "error": "同じidのジョブが実行中です"})
+                return
+            self.active[job.id] = job
+        self.jobs.put(job)
+        job.send("queued", position=self.jobs.qsize())
+
+    def cancel_all(self):
+        with self.lock:
+            for job in self.active.values():
+                job.cancel.set()
+
+    def wait_for_channel(self, channel):
+        """この接続から受けたジョブがすべて終わるまで待つ"""
+        with self.idle:
+            self.idle.wait_for(lambda: all(j.channel is not channel for j in self.active.values()))
+
+    def stop(self):
+        """受付を止め、キュー済みのジョブを終えてからジョブ実行スレッドを終わらせる"""
+        self.stopping.set()
+        self.jobs.put(None)
+        self.runner.join()
+
+    def _run_jobs(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            try:
+                self._run_job(job)
+            finally:
+                with self.idle:
+                    self.active.pop(job.id, None)
+                    self.idle.notify_all()
+
+    def _run_job(self, job):
+        global LOG_TAP, metrics, page_stats
+        # 計測はジョブ単位で集計し直す（読み込みタイムアウトの観測値はジョブをまたいで引き継ぐ）
+        fresh = Metrics()
+        fresh.sink = metrics.sink
+        metrics = fresh
+        page_stats = PageStats()
+        writer = ResultWriter("ndjson", self.session.args.checkpoint_interval,
+                              write=job.channel.send, extra={"job": job.id}, sink=self.session.sink,
+                              preflight=self.session.preflight)
+        self.current = job.id
+        LOG_TAP = lambda msg: job.send("progress", message=msg)
+        error = None
+        try:
+            if not job.cancel.is_set():
+                log(f"🚀 ジョブ {job.id}: キーワード={'、'.join(job.keywords)}, エリア数={len(job.grid or job.cities)}")
+                self.session.ensure_alive()
+                known = job.known
+                if job.known_db:
+                    if not self.session.sink:
+                        raise RuntimeError("known_db には --sqlite の指定が必要です")
+                    known = {**self.session.sink.known_places(), **(known or {})}
+                if known:
+                    log(f"📋 既知プレイス: {len(known)}件")
+                self.session.run(job.keywords, job.cities, job.max_pages, writer, job.cancel, job.grid,
+                                 known, job.refresh_known)
+        except Exception as e:
+            error = str(e)
+            log(f"❌ ジョブ {job.id} エラー: {e}")
+        finally:
+            writer.flush()
+            self.session.report(writer.count)
+            log(f"🔚 完了: 合計 {writer.count} 件（ジョブ {job.id}）")
+            LOG_TAP = None
+            self.current = None
+        done = {"rows": writer.count, "cancelled": job.cancel.is_set(), "summary": metrics.summary(writer.count)}
+        if error:
+            done["error"] = error
+        job.send("done", **done)
+
+def serve_stdio(daemon):
+    """stdinから1行1リクエストを読み、stdoutへ応答する（EOFでキュー済みのジョブを終えて終了）"""
+    def write(line):
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+    channel = JobChannel(write)
+    for line in sys.stdin:
+        if not daemon.handle(line, channel):
+            break
+
+def serve_unix(daemon, sock_path):
+    """Unixソケットで待ち受ける（接続ごとに1行1リクエスト。shutdown でサーバーごと終了）"""
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def write(line):
+                self.wfile.write(line.encode("utf-8"))
+                self.wfile.flush()
+
+            channel = JobChannel(write)
+            for raw in self.rfile:
+                if not daemon.handle(raw.decode("utf-8", "replace"), channel):
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    return
+            # 書き込み側が閉じても、受けたジョブの応答は返し終えてから切断する
+            daemon.wait_for_channel(channel)
+
+    with suppress(FileNotFoundError):
+        os.unlink(sock_path)
+    server = socketserver.ThreadingUnixStreamServer(sock_path, Handler)
+    server.daemon_threads = True
+    log(f"🔌 常駐モード: {sock_path} で待機中")
+    try:
+        server.serve_forever()
     finally:
-        with suppress(Exception):
-            driver.quit()
+        server.server_close()
+        with suppress(OSError):
+            os.unlink(sock_path)
+
+def serve(args):
+    """--serve: Chromeを起動したまま複数のジョブを受け付ける"""
+    try:
+        session = ScrapeSession(args)
+    except SinkError as e:
+        print(json.dumps({"type": "error", "error": f"DB接続失敗: {str(e)}"}), file=sys.stdout, flush=True)
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"type": "error", "error": f"Chrome起動失敗: {str(e)}"}), file=sys.stdout, flush=True)
+        sys.exit(1)
+    # 同意画面などの初回処理はジョブを受ける前に済ませておく
+    with suppress(Exception):
+        open_maps_home(session.driver)
+
+    daemon = ScrapeDaemon(session)
+    log(f"🟢 常駐モード開始: {args.serve}")
+    try:
+        if args.serve == "stdio":
+            serve_stdio(daemon)
+        else:
+            serve_unix(daemon, args.serve[len("unix:"):])
+    except KeyboardInterrupt:
+        daemon.cancel_all()
+    finally:
+        daemon.stop()
+        session.close()
+    log("👋 常駐モード終了")
+
+
+def main():
+    global LEAN_MODE, MAPS_BASE_URL, EMBEDDED_MODE, PROFILE_DIR, BACKEND
+    parser = argparse.ArgumentParser(description="Googleマップスクレイパー")
+    parser.add_argument("--keyword", help="検索キーワード（例: リノベーション業者）")
+    parser.add_argument("--keywords", help="複数キーワード（JSON配列）。キーワード×エリアを1回の実行でまとめて処理")
+    parser.add_argument("--cities", help="エリアリスト（JSON配列）")
+    parser.add_argument("--grid", default=None,
+                        help='格子検索の範囲（JSON）: {"name":"奈良市","bbox":[南,西,北,東]} または "polygon":[[lat,lng],...]。配列で複数可')
+    parser.add_argument("--grid-full", type=int, default=GRID_FULL_RESULTS,
+                        help="格子検索でセルを4分割する一覧件数のしきい値")
+    parser.add_argument("--grid-max-depth", type=int, default=GRID_MAX_DEPTH, help="格子検索の最大分割段数")
+    parser.add_argument("--resolve", default=None,
+                        help="保存済みの結果（json / ndjson, - で stdin）を名寄せして統合した行を出力する（Chromeは起動しない）")
+    parser.add_argument("--resolve-db", default=None,
+                        help="--resolve で既存の leads も比較に含めるDB（一致した行に lead_ids を付ける）")
+    parser.add_argument("--serve", default=None,
+                        help="常駐モード: stdio または unix:/path/to.sock（1行1JSONでジョブを受け付ける）")
+    parser.add_argument("--max-pages", type=int, default=5, help="最大ページ数")
+    parser.add_argument("--headless", action="store_true", help="ヘッドレスモードで実行")
+    parser.add_argument("--events", default=None,
+                        help="フェーズ別計測イベントのJSON出力先（stderr またはファイルパス）")
+    parser.add_argument("--base-url", default=MAPS_BASE_URL, help="GoogleマップのベースURL（ベンチマーク用）")
+    parser.add_argument("--lean", action="store_true", help="画像・フォント・地図タイル等をブロックして軽量化")
+    parser.add_argument("--dom-only", action="store_true",
+                        help="埋め込みデータからの高速抽出を使わず、描画後のDOMから抽出する")
+    parser.add_argument("--backend", choices=["selenium", "cdp"], default="selenium",
+                        help="プレイス詳細の読み込み方式（cdp=DevToolsへ直接接続してイベントで待つ, 要websockets）")
+    parser.add_argument("--workers", type=int, default=1, help="詳細抽出の並列Chrome数（1=従来の逐次処理）")
+    parser.add_argument("--tabs", type=int, default=1,
+                        help="1つのChromeで同時に読み込むプレイスタブ数（1=従来どおり1件ずつ開閉）")
+    parser.add_argument("--fixed-timeout", action="store_true",
+                        help=f"読み込みタイムアウトを固定（{CARD_LOAD_TIMEOUT}秒）にする（既定は観測値 p99×係数）")
+    parser.add_argument("--timeout-factor", type=float, default=2.0, help="適応タイムアウトの係数（p99×係数）")
+    parser.add_argument("--recycle-rss-mb", type=float, default=2000,
+                        help="Chrome（プロセスツリー）のRSSがこれを超えたら再起動（MB, 0で無効, 要psutil）")
+    parser.add_argument("--recycle-latency-factor", type=float, default=3.0,
+                        help="読み込み時間の中央値が起動直後の何倍になったら再起動するか（0で無効）")
+    parser.add_argument("--recycle-every", type=int, default=0,
+                        help="1つのChromeで開くプレイス数の上限（超えたら再起動, 0で無効）")
+    parser.add_argument("--keep-other-areas", action="store_true",
+                        help="住所が検索エリア外（かつ他の検索エリアでもない）の行も除外せずに出力する")
+    parser.add_argument("--format", choices=["json", "ndjson"], default="json",
+                        help="出力形式（json=終了時に配列で一括 / ndjson=1行1件で逐次出力）")
+    parser.add_argument("--checkpoint-interval", type=float, default=CHECKPOINT_INTERVAL,
+                        help="ndjson時にcheckpoint行を出す間隔（秒）")
+    parser.add_argument("--profile-dir", nargs="?", const=DEFAULT_PROFILE_DIR, default=None,
+                        help="Chromeのプロファイルを保存して同意Cookie・キャッシュを次回に引き継ぐ（パス省略時は data/chrome-profile）")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_PATH, default=None,
+                        help="抽出済みプレイスのキャッシュDB（パス省略時は data/scrape-cache.db）")
+    parser.add_argument("--known", default=None,
+                        help="既知プレイスのファイル（1行1件: Maps URL / FID / cid）。該当プレイスは詳細を開かない")
+    parser.add_argument("--refresh-known", action="store_true",
+                        help="既知プレイスは一覧上のクチコミ数だけ出力する（ndjson の refresh 行）")
+    parser.add_argument("--sqlite", nargs="?", const=DEFAULT_SQLITE_PATH, default=None,
+                        help="抽出した行をアプリのDB（leads）へ直接保存する（パス省略時は data/sales-dx.db）")
+    parser.add_argument("--preflight", action="store_true",
+                        help="公式サイトURLを並行して確認し、ステータス・転送先・TLS・応答時間を行に付ける")
+    parser.add_argument("--preflight-concurrency", type=int, default=PREFLIGHT_CONCURRENCY, help="サイト確認の同時接続数")
+    parser.add_argument("--preflight-per-host", type=int, default=PREFLIGHT_PER_HOST, help="サイト確認のホストごとの同時接続数")
+    parser.add_argument("--preflight-timeout", type=float, default=PREFLIGHT_TIMEOUT, help="サイト確認のタイムアウト（秒）")
+    parser.add_argument("--cache-ttl-days", type=float, default=CACHE_TTL_DAYS, help="キャッシュの有効日数")
+    parser.add_argument("--cache-max-entries", type=int, default=CACHE_MAX_ENTRIES, help="キャッシュの最大件数")
+    args = parser.parse_args()
+    if args.serve and args.serve != "stdio" and not args.serve.startswith("unix:"):
+        parser.error("--serve には stdio または unix:/path/to.sock を指定してください")
+    if args.resolve:
+        run_resolve(args)
+        return
+    if not args.serve and not ((args.keyword or args.keywords) and (args.cities or args.grid)):
+        parser.error("--keyword（または --keywords）と --cities（または --grid）が必要です（--serve / --resolve 時を除く）")
+
+    if webdriver is None:
+        print(json.dumps({"error": "selenium is not installed. Run: pip3 install selenium"}), file=sys.stdout)
+        sys.exit(1)
+
+    LEAN_MODE = args.lean
+    EMBEDDED_MODE = not args.dom_only
+    BACKEND = args.backend
+    if BACKEND == "cdp" and websockets is None:
+        log("⚠ websockets が無いため --backend cdp は使えません（Selenium で続行）")
+    if args.profile_dir:
+        PROFILE_DIR = os.path.abspath(args.profile_dir)
+        log(f"👤 プロファイル: {PROFILE_DIR}")
+    MAPS_BASE_URL = args.base_url.rstrip("/")
+    metrics.configure(args.events)
+    scheduler.adaptive = not args.fixed_timeout
+    scheduler.factor = args.timeout_factor
+    health.rss_mb = args.recycle_rss_mb
+    health.latency_factor = args.recycle_latency_factor
+    health.every = args.recycle_every
+    health.headless = args.headless
+    health.lean = args.lean
+    if args.recycle_rss_mb and psutil is None:
+        log("⚠ psutil が無いためChromeのメモリ監視は無効（読み込み時間・件数のみで判定）")
+
+    if args.serve:
+        serve(args)
+        return
+
+    grid = parse_grid_areas(json.loads(args.grid)) if args.grid else None
+    cities = json.loads(args.cities) if args.cities else []
+    keywords = json.loads(args.keywords) if args.keywords else [args.keyword]
+    known = None
+    if args.known:
+        known = load_known_places(args.known)
+        log(f"📋 既知プレイス: {len(known)}件（{args.known}）")
+
+    log(f"🚀 スクレイピング開始: キーワード={'、'.join(keywords)}, エリア数={len(grid or cities)}"
+        + ("（格子検索）" if grid else ""))
+
+    # Chrome起動
+    try:
+        session = ScrapeSession(args)
+    except SinkError as e:
+        print(json.dumps({"error": f"DB接続失敗: {str(e)}"}), file=sys.stdout)
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": f"Chrome起動失敗: {str(e)}"}), file=sys.stdout)
+        sys.exit(1)
+
+    writer = ResultWriter(args.format, args.checkpoint_interval, sink=session.sink, preflight=session.preflight)
+    lost = None
+    try:
+        session.run(keywords, cities, args.max_pages, writer, grid=grid, known=known,
+                    refresh_known=args.refresh_known)
+    except BrowserLost as e:
+        # 取得済みの行は出力してから異常終了する
+        log(f"✖ 実行を打ち切ります: {e}")
+        lost = e
+    finally:
+        writer.flush()
+        session.close()
+        session.report(writer.count)
 
     # JSON出力
-    log(f"\n🔚 完了: 合計 {len(all_results)} 件")
-    print(json.dumps(all_results, ensure_ascii=False))
+    log(f"\n🔚 {'中断' if lost else '完了'}: 合計 {writer.count} 件")
+    writer.close()
+    if lost:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
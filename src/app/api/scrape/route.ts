@@ -1,24 +1,8 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { getDb } from '@/lib/db';
-import { spawn } from 'child_process';
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
 import path from 'path';
 
-interface ScrapeResult {
-    company_name: string;
-    category: string;
-    phone: string;
-    postal_code: string;
-    address: string;
-    website_url: string;
-    sns_urls: string;
-    review_count: number;
-    latitude: number | null;
-    longitude: number | null;
-    google_maps_url: string;
-    area: string;
-    industry: string;
-}
-
 // Store running scrape state in memory
 let currentScrape: {
     running: boolean;
@@ -29,10 +13,114 @@ let currentScrape: {
     totalCities: number;
     currentCity: number;
     currentCityName: string;
-} = { running: false, logs: [], progress: '', startedAt: 0, percentage: 0, totalCities: 0, currentCity: 0, currentCityName: '' };
+    metrics: Record<string, unknown> | null;
+} = { running: false, logs: [], progress: '', startedAt: 0, percentage: 0, totalCities: 0, currentCity: 0, currentCityName: '', metrics: null };
 
 const MAX_RUN_MS = 30 * 60 * 1000; // 30分タイムアウト
 
+// 常駐スクレイパー（scraper.py --serve stdio）からの応答1行分
+interface DaemonMessage {
+    job?: string;
+    type?: string;
+    message?: string;
+    error?: string;
+    rows?: number;
+    cancelled?: boolean;
+    google_maps_url?: string;
+    review_count?: number;
+    summary?: Record<string, unknown>;
+    code?: number | null;
+    added?: number;
+    skipped?: number;
+    lead_ids?: number[];
+}
+
+// Chromeを起動したまま複数ジョブを受け付ける常駐プロセス（起動オプションが変わったら作り直す）
+let daemon: {
+    proc: ChildProcessWithoutNullStreams;
+    key: string;
+    listeners: Map<string, (msg: DaemonMessage) => void>;
+} | null = null;
+let activeJobId: string | null = null;
+
+function getDaemon(headless: boolean, workers: number, cache: boolean, profile: boolean, preflight: boolean) {
+    const dbPath = path.join(process.cwd(), 'data', 'sales-dx.db');
+    const key = JSON.stringify({ headless, workers, cache, profile, preflight, dbPath });
+    if (daemon && daemon.key === key && daemon.proc.exitCode === null) return daemon;
+    if (daemon && daemon.proc.exitCode === null) daemon.proc.stdin.end();
+
+    const scriptPath = path.join(process.cwd(), 'scripts', 'scraper.py');
+    const args = [scriptPath, '--serve', 'stdio', '--events', 'stderr'];
+    if (headless) args.push('--headless');
+    if (workers > 1) args.push('--workers', String(workers));
+    if (cache) args.push('--cache');
+    // 同意Cookie・HTTPキャッシュを data/chrome-profile に保存して再起動後も使い回す
+    if (profile) args.push('--profile-dir');
+    // 抽出した行はスクレイパーが leads へ直接バッチ保存する（重複判定は dedupe_key のユニークインデックス）
+    args.push('--sqlite', dbPath);
+    // 公式サイトを保存前に並行確認し、不通・SNS・ポータルのサイトは自動分析に回さない
+    if (preflight) args.push('--preflight');
+
+    const proc = spawn('/usr/bin/python3', args, {
+        cwd: process.cwd(),
+        env: {
+            ...process.env,
+            PATH: `/usr/local/bin:/usr/bin:/bin:/opt/homebrew/bin:${process.env.PATH || ''}`,
+            PYTHONUNBUFFERED: '1',
+        },
+    });
+    const d = { proc, key, listeners: new Map<string, (msg: DaemonMessage) => void>() };
+
+    // stdout: NDJSON。job付きの行はそのジョブへ、それ以外（起動失敗など）は実行中ジョブへ渡す
+    let stdoutBuf = '';
+    proc.stdout.on('data', (data: Buffer) => {
+        stdoutBuf += data.toString();
+        let nl: number;
+        while ((nl = stdoutBuf.indexOf('\n')) >= 0) {
+            const line = stdoutBuf.slice(0, nl).trim();
+            stdoutBuf = stdoutBuf.slice(nl + 1);
+            if (!line) continue;
+            let msg: DaemonMessage;
+            try {
+                msg = JSON.parse(line);
+            } catch (e) {
+                currentScrape.logs.push(`❌ JSON解析エラー: ${e} / ${line.slice(0, 200)}`);
+                continue;
+            }
+            const target = d.listeners.get(msg.job || activeJobId || '');
+            if (target) target(msg);
+            else if (msg.error) currentScrape.logs.push(`❌ ${msg.error}`);
+        }
+    });
+
+    // stderr: 進捗ログはジョブごとの progress 行で受け取るので、ここでは例外トレースなどだけを拾う
+    let stderrBuf = '';
+    proc.stderr.on('data', (data: Buffer) => {
+        stderrBuf += data.toString();
+        let nl: number;
+        while ((nl = stderrBuf.indexOf('\n')) >= 0) {
+            const line = stderrBuf.slice(0, nl);
+            stderrBuf = stderrBuf.slice(nl + 1);
+            if (line.startsWith('Traceback') || line.startsWith('❌')) currentScrape.logs.push(line);
+        }
+    });
+
+    const onExit = (code: number | null) => {
+        for (const listener of [...d.listeners.values()]) listener({ type: 'exit', code });
+        d.listeners.clear();
+        if (daemon === d) daemon = null;
+    };
+    proc.stdin.on('error', () => { /* 終了済みプロセスへの書き込みは close 側で扱う */ });
+    proc.on('close', onExit);
+    proc.on('error', (err: Error) => {
+        currentScrape.logs.push(`❌ プロセスエラー: ${err.message}`);
+        onExit(null);
+    });
+
+    daemon = d;
+    return d;
+}
+
 // Parse progress from stderr log lines
 function parseProgress(line: string) {
     // Pattern: 🔎 [1/5] 検索: 奈良市　リノベーション業者
@@ -75,141 +163,113 @@ export async function POST(request: NextRequest) {
     }
 
     const body = await request.json();
-    const { keyword, cities, headless = true, maxPages = 5 } = body;
+    const { keyword, keywords, cities, headless = true, maxPages = 5, workers = 1, cache = false, profile = false, deltaOnly = false, refreshKnown = false, preflight = false } = body;
+    // keywords（配列）を渡すとキーワード×エリアを1ジョブで処理し、重複するプレイスは1回だけ抽出する
+    const keywordList: string[] = Array.isArray(keywords) && keywords.length > 0 ? keywords : keyword ? [keyword] : [];
 
-    if (!keyword || !cities || !Array.isArray(cities) || cities.length === 0) {
-        return NextResponse.json({ error: 'keyword と cities（配列）が必要です' }, { status: 400 });
+    if (keywordList.length === 0 || !cities || !Array.isArray(cities) || cities.length === 0) {
+        return NextResponse.json({ error: 'keyword（または keywords 配列）と cities（配列）が必要です' }, { status: 400 });
     }
 
     // Start scraping in background
-    currentScrape = { running: true, logs: [], progress: '開始中...', startedAt: Date.now(), percentage: 0, totalCities: cities.length, currentCity: 0, currentCityName: '' };
+    currentScrape = { running: true, logs: [], progress: '開始中...', startedAt: Date.now(), percentage: 0, totalCities: cities.length, currentCity: 0, currentCityName: '', metrics: null };
 
-    const scriptPath = path.join(process.cwd(), 'scripts', 'scraper.py');
+    const db = getDb();
 
-    const args = [
-        scriptPath,
-        '--keyword', keyword,
-        '--cities', JSON.stringify(cities),
-        '--max-pages', String(maxPages),
-    ];
-    if (headless) args.push('--headless');
+    const refreshStmt = db.prepare(`
+        UPDATE leads SET review_count = ? WHERE google_maps_url = ? AND source = 'google_maps'
+      `);
 
-    const proc = spawn('/usr/bin/python3', args, {
-        cwd: process.cwd(),
-        env: {
-            ...process.env,
-            PATH: `/usr/local/bin:/usr/bin:/bin:/opt/homebrew/bin:${process.env.PATH || ''}`,
-            PYTHONUNBUFFERED: '1',
-        },
-    });
+    let refreshed = 0;
 
-    let stdout = '';
-    let stderrBuf = '';
+    let added = 0;
+    let skipped = 0;
+    const newLeadIds: number[] = [];
 
-    proc.stdout.on('data', (data: Buffer) => {
-        stdout += data.toString();
-    });
+    // 進捗ログ1行分の処理
+    const handleProgress = (line: string) => {
+        currentScrape.logs.push(line);
+        currentScrape.progress = line;
+        parseProgress(line);
+    };
 
-    proc.stderr.on('data', (data: Buffer) => {
-        const chunk = data.toString();
-        stderrBuf += chunk;
-        const lines = chunk.split('\n').filter((l: string) => l.trim());
-        for (const line of lines) {
-            currentScrape.logs.push(line);
-            currentScrape.progress = line;
-            parseProgress(line);
-        }
-    });
+    const jobId = `scrape-${Date.now()}`;
+    const isCurrent = () => activeJobId === jobId;
 
-    proc.on('close', (code: number | null) => {
-        if (code !== 0) {
-            currentScrape.logs.push(`❌ プロセス終了コード: ${code}`);
-            if (stdout.trim()) {
-                currentScrape.logs.push(`stdout: ${stdout.slice(-500)}`);
-            }
+    const finish = (ok: boolean, note: string) => {
+        d.listeners.delete(jobId);
+        if (!isCurrent()) return;
+        activeJobId = null;
+
+        if (!ok) {
+            currentScrape.logs.push(`❌ ${note}（${added}件は保存済み）`);
             currentScrape.progress = 'エラーで終了';
-            currentScrape.running = false;
-            return;
+        } else {
+            currentScrape.logs.push(`✅ 完了: ${added}件追加, ${skipped}件スキップ（重複/無効）${refreshed ? `, ${refreshed}件のクチコミ数を更新` : ''}${note}`);
+            currentScrape.progress = `完了: ${added}件追加`;
         }
 
-        try {
-            const results: ScrapeResult[] = JSON.parse(stdout);
-            const db = getDb();
-
-            const insertStmt = db.prepare(`
-        INSERT INTO leads (company_name, industry, area, phone, website_url, google_maps_url,
-          category, postal_code, address, sns_urls, review_count, latitude, longitude, source)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'google_maps')
-      `);
-
-            const checkStmt = db.prepare(`
-        SELECT id FROM leads WHERE company_name = ? AND (phone = ? OR (phone = '' AND ? = ''))
-      `);
-
-            let added = 0;
-            let skipped = 0;
-            const newLeadIds: number[] = [];
-
-            const insertAll = db.transaction(() => {
-                for (const r of results) {
-                    if (!r.company_name) { skipped++; continue; }
-
-                    // Duplicate check
-                    const existing = checkStmt.get(r.company_name, r.phone || '', r.phone || '');
-                    if (existing) { skipped++; continue; }
-
-                    const info = insertStmt.run(
-                        r.company_name, r.industry || '', r.area || '', r.phone || '',
-                        r.website_url || '', r.google_maps_url || '',
-                        r.category || '', r.postal_code || '', r.address || '',
-                        r.sns_urls || '', r.review_count || 0,
-                        r.latitude, r.longitude
-                    );
-                    if (r.website_url) {
-                        newLeadIds.push(Number(info.lastInsertRowid));
-                    }
-                    added++;
-                }
+        // Auto-analyze all new leads with website URLs (FREE — no API cost)
+        if (newLeadIds.length > 0) {
+            currentScrape.logs.push(`🔍 ${newLeadIds.length}件のサイト分析を自動実行中...`);
+            import('@/lib/auto-analyze').then(({ autoAnalyzeLeads }) => {
+                autoAnalyzeLeads(newLeadIds).then(() => {
+                    currentScrape.logs.push(`✅ 自動分析完了: ${newLeadIds.length}件`);
+                }).catch(err => {
+                    currentScrape.logs.push(`⚠️ 自動分析で一部エラー: ${err}`);
+                });
             });
+        }
+        currentScrape.running = false;
+    };
 
-            insertAll();
-
-            currentScrape.logs.push(`✅ 完了: ${added}件追加, ${skipped}件スキップ（重複/無効）`);
-            currentScrape.progress = `完了: ${added}件追加`;
-
-            // Auto-analyze all new leads with website URLs (FREE — no API cost)
-            if (newLeadIds.length > 0) {
-                currentScrape.logs.push(`🔍 ${newLeadIds.length}件のサイト分析を自動実行中...`);
-                import('@/lib/auto-analyze').then(({ autoAnalyzeLeads }) => {
-                    autoAnalyzeLeads(newLeadIds).then(() => {
-                        currentScrape.logs.push(`✅ 自動分析完了: ${newLeadIds.length}件`);
-                    }).catch(err => {
-                        currentScrape.logs.push(`⚠️ 自動分析で一部エラー: ${err}`);
-                    });
-                });
+    // ジョブ宛ての応答: progress / stored（DB保存済み件数）/ refresh / done / error / exit（常駐プロセス終了）
+    const handleMessage = (msg: DaemonMessage) => {
+        if (msg.type === 'stored') {
+            added += msg.added || 0;
+            skipped += msg.skipped || 0;
+            newLeadIds.push(...(msg.lead_ids || []));
+        } else if (msg.type === 'refresh' && msg.google_maps_url) {
+            try {
+                refreshed += refreshStmt.run(msg.review_count || 0, msg.google_maps_url).changes;
+            } catch (e) {
+                currentScrape.logs.push(`❌ DB更新エラー: ${e}`);
             }
-        } catch (e) {
-            currentScrape.logs.push(`❌ JSON解析エラー: ${e}`);
-            currentScrape.progress = 'JSONエラー';
+        } else if (msg.type === 'progress' && msg.message) {
+            if (isCurrent()) handleProgress(msg.message);
+        } else if (msg.type === 'done') {
+            if (isCurrent() && msg.summary) currentScrape.metrics = msg.summary;
+            if (msg.error) finish(false, `スクレイピングエラー: ${msg.error}`);
+            else finish(true, msg.cancelled ? '（キャンセル）' : '');
+        } else if (msg.type === 'exit') {
+            finish(false, `プロセス終了コード: ${msg.code}`);
+        } else if (msg.error && isCurrent()) {
+            currentScrape.logs.push(`❌ ${msg.error}`);
         }
-        currentScrape.running = false;
-    });
+    };
 
-    proc.on('error', (err: Error) => {
-        currentScrape.logs.push(`❌ プロセスエラー: ${err.message}`);
-        currentScrape.progress = 'エラー';
-        currentScrape.running = false;
-    });
+    const d = getDaemon(Boolean(headless), Number(workers) || 1, Boolean(cache), Boolean(profile), Boolean(preflight));
+    d.listeners.set(jobId, handleMessage);
+    activeJobId = jobId;
+    d.proc.stdin.write(JSON.stringify({
+        op: 'scrape', id: jobId, keywords: keywordList, cities, max_pages: Number(maxPages),
+        // deltaOnly: 登録済みのプレイスは詳細を開かず、新規だけを取得する（既知URLは常駐プロセスが --sqlite のDBから読む）
+        known_db: Boolean(deltaOnly), refresh_known: Boolean(deltaOnly && refreshKnown),
+    }) + '\n');
 
     return NextResponse.json({
         message: 'スクレイピングを開始しました',
-        keyword,
+        keyword: keywordList.join('、'),
         cities: cities.length,
     });
 }
 
-// DELETE: ステータスリセット（ロック解除）
+// DELETE: ステータスリセット（ロック解除）。実行中のジョブは常駐プロセスにキャンセルを送る
 export async function DELETE() {
-    currentScrape = { running: false, logs: [], progress: '', startedAt: 0, percentage: 0, totalCities: 0, currentCity: 0, currentCityName: '' };
+    if (daemon && activeJobId && daemon.proc.exitCode === null) {
+        daemon.proc.stdin.write(JSON.stringify({ op: 'cancel', id: activeJobId }) + '\n');
+    }
+    activeJobId = null;
+    currentScrape = { running: false, logs: [], progress: '', startedAt: 0, percentage: 0, totalCities: 0, currentCity: 0, currentCityName: '', metrics: null };
     return NextResponse.json({ message: 'スクレイピングステータスをリセットしました' });
 }
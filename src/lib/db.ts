@@ -151,6 +151,21 @@ function migrateDb(db: Database.Database) {
   addCol('leads', 'sample_url', 'TEXT', "''");
   addCol('leads', 'sample_status', 'TEXT', "''");
   addCol('leads', 'report_progress', 'TEXT', "''");
+  // 重複判定キー（cid:… / mid:… / np:<正規化店名>|<電話番号>）。scraper.py --sqlite が付与・参照する
+  addCol('leads', 'dedupe_key', 'TEXT', 'NULL');
+  // 住所を分割した都道府県・市区町村（scraper.py が jp_areas.json の表で付与）
+  addCol('leads', 'prefecture', 'TEXT', "''");
+  addCol('leads', 'city', 'TEXT', "''");
+  // 公式サイトの事前確認結果（scraper.py --preflight）。0=接続失敗、NULL=未確認
+  addCol('leads', 'site_status', 'INTEGER', 'NULL');
+  addCol('leads', 'site_final_url', 'TEXT', "''");
+  db.exec(`
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_leads_dedupe_key ON leads(dedupe_key) WHERE dedupe_key IS NOT NULL AND dedupe_key != '';
+    CREATE INDEX IF NOT EXISTS idx_leads_name_phone ON leads(company_name, phone);
+    CREATE INDEX IF NOT EXISTS idx_leads_pref_city ON leads(prefecture, city);
+    CREATE INDEX IF NOT EXISTS idx_leads_area ON leads(area);
+    CREATE INDEX IF NOT EXISTS idx_leads_gmaps_url ON leads(google_maps_url);
+  `);
 
   // analyses — new 21-item fields
   addCol('analyses', 'has_proper_h1', 'INTEGER', '0');